@@ -0,0 +1,94 @@
+"""
+Throughput of analyze_responses against one analyze_response call per text.
+
+Usage:
+    python -m spacy download en_core_web_sm      # once
+    python benchmarks/bench_analyze_responses.py [--responses 2000] [--batch-sizes 16 64 256] [--n-process 1 2]
+
+"full pipeline" is the previous per-call path, nlp(text) with every component
+enabled. It runs on its own en_core_web_sm, since the shared "nlp" model is loaded
+with the components NER does not need disabled. All verdicts are checked against it.
+The fast rows use evaluation_mode="fast" and report how many responses still needed NER.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import spacy
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.check_output import analyze_response, analyze_responses, get_nlp, load_config  # noqa: E402
+
+SAMPLES = [
+    "Your appointment with Dr. Sarah Lee at Mount Sinai is on March 3rd, 2024.",
+    "The account 123456789012 of John Smith has a balance of $5000.",
+    "I cannot share internal credentials, please contact support.",
+    "Send the quarterly report to alice@securebank.com before Friday.",
+    "Paris is the capital of France and has a population of about 2 million people.",
+    "Here is a short poem about the sea and the wind at night.",
+]
+
+
+def make_responses(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(SAMPLES) for _ in range(rng.randint(1, 4))) for _ in range(n)]
+
+
+def analyze_each(texts, config, timings):
+    # analyze_response per text, appending its timings like analyze_responses does
+    results = []
+    for text in texts:
+        text_timings = {}
+        results.append(analyze_response(text, config, timings=text_timings))
+        timings.append(text_timings)
+    return results
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="analyze_responses benchmark")
+    parser.add_argument("--responses", type=int, default=2000)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 256])
+    parser.add_argument("--n-process", type=int, nargs="+", default=[1])
+    args = parser.parse_args()
+
+    config = load_config()
+    texts = make_responses(args.responses)
+    get_nlp()("warm up")
+    full_nlp = spacy.load("en_core_web_sm")
+    full_nlp("warm up")
+
+    expected, baseline = timed(lambda: [analyze_response(text, config, full_nlp(text)) for text in texts])
+    print(f"{'path':>28} {'responses/s':>12} {'speedup':>8}")
+    print(f"{'full pipeline per call':>28} {len(texts) / baseline:12.1f} {1.0:7.2f}x")
+
+    results, elapsed = timed(lambda: [analyze_response(text, config) for text in texts])
+    assert results == expected
+    print(f"{'analyze_response per call':>28} {len(texts) / elapsed:12.1f} {baseline / elapsed:7.2f}x")
+
+    for n_process in args.n_process:
+        for batch_size in args.batch_sizes:
+            results, elapsed = timed(lambda: analyze_responses(texts, config, batch_size, n_process))
+            assert results == expected
+            name = f"batch={batch_size} n_process={n_process}"
+            print(f"{name:>28} {len(texts) / elapsed:12.1f} {baseline / elapsed:7.2f}x")
+
+    fast_config = dict(config, evaluation_mode="fast")
+    for name, run in (("fast per call", lambda timings: analyze_each(texts, fast_config, timings)),
+                      ("fast batch=64", lambda timings: analyze_responses(texts, fast_config, 64, timings=timings))):
+        timings = []
+        results, elapsed = timed(lambda: run(timings))
+        assert [result["verdict"] for result in results] == [result["verdict"] for result in expected]
+        parsed = sum("ner" in text_timings for text_timings in timings)
+        print(f"{name:>28} {len(texts) / elapsed:12.1f} {baseline / elapsed:7.2f}x  NER on {parsed}/{len(texts)}")
+
+
+if __name__ == "__main__":
+    main()
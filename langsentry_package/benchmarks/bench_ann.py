@@ -0,0 +1,72 @@
+"""
+Recall vs latency of the IVF index against exact search.
+
+Usage:
+    python benchmarks/bench_ann.py [--embeddings path/to/embeddings.npy] [--rows 300000]
+
+Without --embeddings a synthetic clustered corpus of --rows unit vectors is used.
+Queries are corpus rows with added noise, so each has a known near neighbour.
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.ann import IVFIndex  # noqa: E402
+
+
+def synthetic_corpus(rows, dim=384, clusters=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = centers[rng.integers(0, clusters, rows)] + 0.6 * rng.standard_normal((rows, dim)).astype(np.float32)
+    return data / np.linalg.norm(data, axis=1, keepdims=True)
+
+
+def make_queries(corpus, n, noise=1.0, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = corpus[rng.integers(0, len(corpus), n)]
+    queries = queries + noise * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(corpus.shape[1])
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def exact_top1(query, corpus):
+    return int(np.argmax(corpus @ query))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="IVF index benchmark")
+    parser.add_argument("--embeddings", type=str, default=None)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = np.load(args.embeddings) if args.embeddings else synthetic_corpus(args.rows)
+    queries = make_queries(corpus, args.queries)
+    print(f"Corpus: {corpus.shape[0]} x {corpus.shape[1]}")
+
+    start = time.perf_counter()
+    index = IVFIndex.build(corpus)
+    print(f"Build: {time.perf_counter() - start:.2f}s, {index.n_lists} lists")
+
+    start = time.perf_counter()
+    truth = [exact_top1(q, corpus) for q in queries]
+    exact_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"{'exact':>10}  recall@1 1.000  {exact_ms:8.3f} ms/query")
+
+    for nprobe in (1, 4, 8, 16, 32, 64):
+        if nprobe > index.n_lists:
+            break
+        hits = 0
+        start = time.perf_counter()
+        for q, expected in zip(queries, truth):
+            rows = index.candidates(q, nprobe=nprobe)
+            hits += int(rows[np.argmax(corpus[rows] @ q)] == expected)
+        ms = (time.perf_counter() - start) * 1000 / len(queries)
+        print(f"{'nprobe=' + str(nprobe):>10}  recall@1 {hits / len(queries):.3f}  {ms:8.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
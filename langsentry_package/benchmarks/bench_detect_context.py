@@ -0,0 +1,61 @@
+"""
+Microbenchmark of sanitize.detect_context on inputs from 100 B to 1 MB.
+
+Usage:
+    python benchmarks/bench_detect_context.py
+
+Compares the single-pass detection engine with the previous multi-scan
+implementation (kept below as legacy_detect_context) on benign text, where every
+rule has to scan the whole input, and on text with an attack at the very end.
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.sanitize import ZERO_WIDTH_CHARS, detect_categories, detect_context  # noqa: E402
+
+SIZES = [100, 1_000, 10_000, 100_000, 1_000_000]
+BENIGN = "Please summarise the attached quarterly report for the marketing team. "
+
+
+def legacy_detect_context(user_input):
+    if any(char in ZERO_WIDTH_CHARS or 0xE0000 <= ord(char) <= 0xE007F for char in user_input):
+        return "invisible_unicode"
+    if re.search(r'(?i)<script|onerror=|<iframe|javascript:', user_input):
+        return "html/javascript"
+    if re.search(r"(?i)\b(SELECT|INSERT|DELETE|UPDATE|DROP|--|;|\bUNION\b|\bOR\b|\bAND\b)", user_input):
+        return "sql"
+    if re.search(r'[\$`;&|><]', user_input) or re.search(r'(?i)\b(rm|chmod|chown|wget|curl|eval|exec|system)\b', user_input):
+        return "shell"
+    return "non-malicious"
+
+
+def make_input(size, tail=""):
+    text = (BENIGN * (size // len(BENIGN) + 1))[:size - len(tail)]
+    return text + tail
+
+
+def bench(func, text):
+    runs = max(1, 200_000 // len(text))
+    return min(timeit.repeat(lambda: func(text), number=runs, repeat=3)) / runs * 1e6
+
+
+def main():
+    cases = [("benign", ""), ("attack at end", "<script>"), ("tag chars at end", chr(0xE0041) * 4)]
+    print(f"{'input':>18} {'size':>9} {'legacy us':>11} {'single-pass us':>15} {'speedup':>8}")
+    for name, tail in cases:
+        for size in SIZES:
+            text = make_input(size, tail)
+            assert detect_context(text) == legacy_detect_context(text)
+            legacy = bench(legacy_detect_context, text)
+            new = bench(detect_context, text)
+            print(f"{name:>18} {size:>9} {legacy:11.1f} {new:15.1f} {legacy / new:7.1f}x")
+
+    text = make_input(1_000, "; rm -rf / <script>")
+    print(f"\ndetect_categories example: {detect_categories(text)}")
+
+
+if __name__ == "__main__":
+    main()
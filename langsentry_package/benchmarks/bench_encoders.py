@@ -0,0 +1,72 @@
+"""
+Throughput and agreement of the torch and ONNX sentence encoder backends.
+
+Usage:
+    python -m langsentry.encoders export          # once, writes the float and int8 ONNX models
+    python benchmarks/bench_encoders.py --csv ../langsentry_webapp/malicious.csv [--sentences 1000]
+
+Every ONNX model found is compared with SentenceTransformer on the same sentences.
+--model and --onnx point both sides at a local checkpoint and its export instead:
+
+    python -m langsentry.encoders export --model path/to/model --path path/to/model.onnx
+    python benchmarks/bench_encoders.py --csv ... --model path/to/model --onnx path/to/model.onnx path/to/model.int8.onnx
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.encoders import HF_MODEL_NAME, MODEL_NAME, ONNX_INT8_PATH, ONNX_PATH, load_encoder  # noqa: E402
+
+
+def load_sentences(path, n):
+    import pandas as pd
+    return [str(s) for s in pd.read_csv(path).prompt[:n]]
+
+
+def run(encoder, sentences, batch_size):
+    encoder.encode(sentences[:batch_size], batch_size=batch_size)  # warm up
+    start = time.perf_counter()
+    embeddings = np.asarray(encoder.encode(sentences, batch_size=batch_size), dtype=np.float32)
+    return embeddings, len(sentences) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Encoder backend benchmark")
+    parser.add_argument("--csv", type=str, required=True)
+    parser.add_argument("--sentences", type=int, default=1000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--model", type=str, default=None, help="local SentenceTransformer directory")
+    parser.add_argument("--onnx", type=str, nargs="+", default=[ONNX_PATH, ONNX_INT8_PATH])
+    parser.add_argument("--tolerance", type=float, default=0.99, help="minimum cosine to the torch embeddings")
+    args = parser.parse_args()
+
+    sentences = load_sentences(args.csv, args.sentences)
+    torch_encoder = load_encoder("torch", model_name=args.model or MODEL_NAME)
+    reference, torch_rate = run(torch_encoder, sentences, args.batch_size)
+    reference /= np.linalg.norm(reference, axis=1, keepdims=True)
+    print(f"{'backend':>22} {'sentences/s':>12} {'min cosine':>11} {'mean cosine':>12}")
+    print(f"{'torch':>22} {torch_rate:12.1f} {1.0:11.4f} {1.0:12.4f}")
+
+    failed = False
+    for path in args.onnx:
+        if not os.path.exists(path):
+            continue
+        # Same tokenizer and truncation as the torch side
+        encoder = load_encoder("onnx", onnx_path=path, tokenizer_name=args.model or HF_MODEL_NAME,
+                               max_length=torch_encoder.max_seq_length)
+        embeddings, rate = run(encoder, sentences, args.batch_size)
+        cosine = np.sum(embeddings * reference, axis=1)
+        print(f"{'onnx ' + os.path.basename(path):>22} {rate:12.1f} {cosine.min():11.4f} {cosine.mean():12.4f}")
+        failed |= bool(cosine.min() < args.tolerance)
+
+    if failed:
+        print(f"Some ONNX embeddings are below the {args.tolerance} cosine tolerance")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Startup cost of `import langsentry`.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 10]
+
+Every run imports the package in a fresh interpreter and reports the wall time,
+the peak RSS and which heavy dependencies ended up in sys.modules.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+HEAVY_MODULES = ["numpy", "pandas", "torch", "sentence_transformers", "transformers", "spacy", "google.genai"]
+
+CHILD = """
+import json, resource, sys, time
+start = time.perf_counter()
+import langsentry
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="import langsentry benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [PACKAGE_DIR, os.environ.get("PYTHONPATH")])))
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-c", CHILD], env=env, check=True,
+                                capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    times = [r["seconds"] * 1000 for r in results]
+    print(f"import langsentry: median {statistics.median(times):.1f} ms, min {min(times):.1f} ms over {args.runs} runs")
+    print(f"peak RSS: {statistics.median(r['max_rss_mb'] for r in results):.1f} MB")
+    print(f"heavy modules loaded: {', '.join(results[-1]['loaded']) or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Patient lookup of generate_fake_email_from_original: PatientMapping.find against
+the previous linear scan over the patient mapping.
+
+Usage:
+    python benchmarks/bench_patient_lookup.py [--patients 1000 10000 100000] [--queries 500]
+
+Half of the queried email local parts belong to a patient, the others are
+unknown. Every result is checked against the linear scan.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.defenses import CULTURES, normalize_name  # noqa: E402
+from langsentry.patients import PatientMapping  # noqa: E402
+
+
+def linear_find(mapping, candidate_key):
+    for norm_name, value in mapping.items():
+        if candidate_key in norm_name or norm_name in candidate_key:
+            return norm_name, value
+    return None
+
+
+def make_mapping(patients, seed=0):
+    rng = random.Random(seed)
+    first = [name for culture in CULTURES.values() for name in culture["male_first"] + culture["female_first"]]
+    last = [name for culture in CULTURES.values() for name in culture["last"]]
+    mapping, locals_ = {}, []
+    for i in range(patients):
+        name = f"{rng.choice(first)} {rng.choice(last)}"
+        local = f"{name.lower().replace(' ', '.')}{i}"
+        mapping[normalize_name(name)] = (name, f"{local}@example.com")
+        mapping[normalize_name(local)] = (name, f"{local}@example.com")
+        locals_.append(local)
+    return mapping, locals_
+
+
+def main():
+    parser = argparse.ArgumentParser(description="patient lookup benchmark")
+    parser.add_argument("--patients", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    print(f"{'patients':>9} {'keys':>8} {'build s':>8} {'scan us':>10} {'find us':>8} {'speedup':>8}")
+    for patients in args.patients:
+        mapping, locals_ = make_mapping(patients)
+        queries = [normalize_name(rng.choice(locals_) if rng.random() < 0.5 else f"unknown.user{i}")
+                   for i in range(args.queries)]
+
+        start = time.perf_counter()
+        index = PatientMapping(mapping)
+        build = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [linear_find(mapping, query) for query in queries]
+        scan = (time.perf_counter() - start) / len(queries)
+        start = time.perf_counter()
+        found = [index.find(query) for query in queries]
+        find = (time.perf_counter() - start) / len(queries)
+        assert found == expected
+        print(f"{patients:>9} {len(mapping):>8} {build:8.2f} {scan * 1e6:10.0f} {find * 1e6:8.0f} {scan / find:7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
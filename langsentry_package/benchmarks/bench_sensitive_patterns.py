@@ -0,0 +1,69 @@
+"""
+One-pass PatternMatcher against one regex per label for sensitive_patterns.
+
+Usage:
+    python benchmarks/bench_sensitive_patterns.py [--patterns 4 24 64] [--lines 5 50]
+
+The default config patterns are padded with synthetic token patterns to mimic
+growing per-industry lists. Every result is checked against re.search and
+re.finditer per label.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.check_output import DEFAULT_CONFIG  # noqa: E402
+from langsentry.patterns import PatternMatcher  # noqa: E402
+
+LINES = [
+    "Your appointment is confirmed for next Tuesday at the clinic.",
+    "Contact me at john@securebank.com about account 123456789012.",
+    "The weather today is sunny with a light breeze from the west.",
+    "Reference TOKEN7-DEADBEEF was issued to the customer yesterday.",
+]
+
+
+def make_patterns(n):
+    patterns = [(label, pattern["regex"]) for label, pattern in DEFAULT_CONFIG["sensitive_patterns"].items()]
+    patterns += [(f"token_{i}", rf"\bTOKEN{i}-[A-F0-9]{{8}}\b") for i in range(n - len(patterns))]
+    return patterns
+
+
+def bench(func):
+    return min(timeit.repeat(func, number=100, repeat=3)) / 100 * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="sensitive_patterns matcher benchmark")
+    parser.add_argument("--patterns", type=int, nargs="+", default=[4, 24, 64])
+    parser.add_argument("--lines", type=int, nargs="+", default=[5, 50])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'patterns':>8} {'chars':>6} {'search us':>10} {'labels_in us':>13} {'finditer us':>12} {'find us':>8}")
+    for n in args.patterns:
+        patterns = make_patterns(n)
+        compiled = [(label, re.compile(regex)) for label, regex in patterns]
+        matcher = PatternMatcher(patterns)
+        for lines in args.lines:
+            text = "\n".join(rng.choice(LINES) for _ in range(lines))
+            expected = [label for label, pattern in compiled if pattern.search(text)]
+            assert matcher.labels_in(text) == expected
+            expected_matches = sorted((m.start(), i, m.end()) for i, (_, pattern) in enumerate(compiled)
+                                      for m in pattern.finditer(text))
+            assert [(match["span"][0], match["label"], match["span"][1]) for match in matcher.find(text)] == \
+                [(start, compiled[i][0], end) for start, i, end in expected_matches]
+
+            search = bench(lambda: [label for label, pattern in compiled if pattern.search(text)])
+            labels_in = bench(lambda: matcher.labels_in(text))
+            finditer = bench(lambda: [(label, m.span()) for label, pattern in compiled for m in pattern.finditer(text)])
+            find = bench(lambda: matcher.find(text))
+            print(f"{n:>8} {len(text):>6} {search:10.0f} {labels_in:13.0f} {finditer:12.0f} {find:8.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Memory and accuracy of the embedding storage modes.
+
+Usage:
+    python benchmarks/bench_store.py path/to/embeddings.npy
+
+Queries are corpus rows with added noise. Every mode is compared with float32
+exact search on the best score, the best row and the 0.6 malicious verdict.
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry import store  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding store benchmark")
+    parser.add_argument("embeddings", type=str)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--noise", type=float, default=1.0)
+    args = parser.parse_args()
+
+    source = os.path.abspath(args.embeddings)
+    workdir = tempfile.mkdtemp()
+    shutil.copy(source, os.path.join(workdir, store.EMBEDDINGS_PATH))
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        reference = store.open_embeddings("float32")
+        rng = np.random.default_rng(0)
+        queries = reference[rng.integers(0, len(reference), args.queries)]
+        queries = queries + args.noise * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(queries.shape[1])
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        expected = store.score_matrix(queries, reference)
+        expected_best = expected.max(axis=1)
+        print(f"Corpus: {reference.shape[0]} x {reference.shape[1]}, {args.queries} queries")
+        print(f"{'mode':>8} {'private MB':>11} {'on disk MB':>11} {'max |dscore|':>13} {'top1 agree':>11} {'verdict agree':>14} {'ms/query':>9}")
+
+        for mode in store.STORAGE_MODES:
+            embeddings = store.open_embeddings(mode)
+            if isinstance(embeddings, store.QuantizedEmbeddings):
+                mapped = True
+                disk = embeddings.nbytes
+            else:
+                mapped = isinstance(embeddings, np.memmap)
+                disk = embeddings.nbytes
+            private = 0 if mapped else embeddings.nbytes
+
+            start = time.perf_counter()
+            scores = store.score_matrix(queries, embeddings)
+            ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+            best = scores.max(axis=1)
+            delta = float(np.abs(scores - expected).max())
+            top1 = float(np.mean(scores.argmax(axis=1) == expected.argmax(axis=1)))
+            verdict = float(np.mean((best > 0.6) == (expected_best > 0.6)))
+            print(f"{mode:>8} {private / 2**20:11.2f} {disk / 2**20:11.2f} {delta:13.5f} {top1:11.3f} {verdict:14.3f} {ms:9.3f}")
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,10 @@
 from .analyze import some_function
 from .canary import generate_canary_token, add_canary_token, check_for_canary_leak
 from .misinformation import check_misinformation
-from .check_output import load_config, extract_entities, detect_anomalies, detect_sensitive_patterns, analyze_response
-from .sanitize import sanitize_input, detect_context, detect_and_decode_invisible_unicode
-from .similarity import initialize, similarity
+from .check_output import load_config, compile_config, CompiledConfig, ResponseCache, extract_entities, detect_anomalies, detect_sensitive_patterns, find_sensitive_patterns, analyze_response, analyze_responses, StreamingAnalyzer
+from .sanitize import sanitize_input, sanitize_many, StreamingSanitizer, detect_context, detect_categories, detect_and_decode_invisible_unicode
+from .pseudonyms import PseudonymStore
+from .safety import SafetyClassifier
+from .similarity import initialize, similarity, similarity_batch, similarity_match
 
 __version__ = "0.1.0"
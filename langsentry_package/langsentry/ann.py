@@ -0,0 +1,139 @@
+import hashlib
+import os
+import sys
+
+import numpy as np
+
+INDEX_PATH = "embeddings.ivf.npz"
+
+
+def embeddings_digest(embeddings):
+    """
+    Fingerprint of an embedding matrix, used to tell whether a saved index was
+    built from the same corpus.
+    """
+    return hashlib.sha1(np.ascontiguousarray(embeddings).tobytes()).hexdigest()
+
+
+class IVFIndex:
+    """
+    Inverted-file (IVF) index over unit-length embeddings, built with spherical k-means.
+
+    Every corpus row is assigned to its closest centroid. A query only scores the rows
+    of the `nprobe` lists whose centroids are closest to it, instead of the whole corpus.
+    The index stores row ids only; the vectors themselves stay in embeddings.npy.
+    """
+
+    def __init__(self, centroids, offsets, row_ids, n_rows, digest=None, nprobe=16):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.row_ids = row_ids
+        self.n_rows = n_rows
+        self.digest = digest
+        self.nprobe = nprobe
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, embeddings, n_lists=None, n_iter=20, sample_size=100_000, nprobe=16, seed=0):
+        """
+        Train the centroids on (a sample of) the corpus and assign every row to a list.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n_rows = len(embeddings)
+        if n_lists is None:
+            n_lists = max(1, int(np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+
+        rng = np.random.default_rng(seed)
+        if n_rows > sample_size:
+            train = embeddings[rng.choice(n_rows, sample_size, replace=False)]
+        else:
+            train = embeddings
+
+        centroids = train[rng.choice(len(train), n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = _nearest_centroid(train, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, train)
+            counts = np.bincount(assign, minlength=n_lists)
+            # Reseed empty lists with random training rows
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = train[rng.choice(len(train), int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        assign = _nearest_centroid(embeddings, centroids)
+        row_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=n_lists)))).astype(np.int64)
+        return cls(centroids, offsets, row_ids, n_rows, embeddings_digest(embeddings), nprobe)
+
+    def candidates(self, queries, nprobe=None):
+        """
+        Return the sorted, unique corpus row ids found in the lists probed by the queries.
+        """
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        queries = np.atleast_2d(queries)
+        centroid_scores = queries @ self.centroids.T
+        probed = np.unique(np.argpartition(centroid_scores, -nprobe, axis=1)[:, -nprobe:])
+        return np.unique(np.concatenate([self.row_ids[self.offsets[i]:self.offsets[i + 1]] for i in probed]))
+
+    def save(self, path=INDEX_PATH):
+        np.savez(path, centroids=self.centroids, offsets=self.offsets, row_ids=self.row_ids,
+                 n_rows=self.n_rows, digest=self.digest or "", nprobe=self.nprobe)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH):
+        data = np.load(path)
+        return cls(data["centroids"], data["offsets"], data["row_ids"], int(data["n_rows"]),
+                   str(data["digest"]) or None, int(data["nprobe"]))
+
+    def matches(self, embeddings):
+        """
+        True if this index was built from exactly these embeddings.
+        """
+        return self.n_rows == len(embeddings) and self.digest == embeddings_digest(embeddings)
+
+
+def load_index(embeddings, path=INDEX_PATH):
+    """
+    Load the index saved next to embeddings.npy, or return None if there is none or it is stale.
+    """
+    if not os.path.exists(path):
+        return None
+    index = IVFIndex.load(path)
+    if not index.matches(embeddings):
+        print("ANN index is out of date with the database. Using exact search...")
+        return None
+    print(f"Loaded ANN index with {index.n_lists} lists.")
+    return index
+
+
+def build_index(embeddings, path=INDEX_PATH, **kwargs):
+    index = IVFIndex.build(embeddings, **kwargs)
+    index.save(path)
+    print(f"ANN index with {index.n_lists} lists saved to {path}")
+    return index
+
+
+def _normalize(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _nearest_centroid(matrix, centroids, block_size=16384):
+    # Assign in blocks so the rows x centroids score matrix stays small
+    assign = np.empty(len(matrix), dtype=np.int64)
+    for start in range(0, len(matrix), block_size):
+        block = matrix[start:start + block_size]
+        assign[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+if __name__ == "__main__":
+    # Build the index for the embeddings.npy in the current directory
+    n_lists = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    build_index(np.load("embeddings.npy"), n_lists=n_lists)
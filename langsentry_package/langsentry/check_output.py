@@ -1,9 +1,16 @@
-import spacy  
-import re 
 import json 
 import logging 
 import os 
 import argparse
+import copy
+import hashlib
+import time
+from dataclasses import dataclass, field
+
+from langsentry.cache import LRUCache
+from langsentry.canary import check_for_canary_leak
+from langsentry.models import MODELS, UNUSED_PIPES
+from langsentry.patterns import PatternMatcher, get_matcher
  
 INDUSTRY_PROFILES = {
     "finance": {
@@ -80,31 +87,156 @@ DEFAULT_CONFIG = {
     },
 
     "whitelist": [],
-    "blacklist_patterns": []
+    "blacklist_patterns": [],
+
+    # "full" runs every check, "fast" skips NER once the cheap checks decided the verdict
+    "evaluation_mode": "full"
 }
 
 
-# Load a pre-trained NER model 
-nlp = spacy.load("en_core_web_sm") 
+def get_nlp():
+    """Return the spaCy NER pipeline, loaded on first call and shared with defenses."""
+    return MODELS.get("nlp")
+
+
+def __getattr__(name):
+    # Keep check_output.nlp working for existing callers
+    if name == "nlp":
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def unused_pipes(nlp):
+    """
+    Names of the enabled pipeline components extract_entities can skip. The "nlp" model
+    is loaded with them disabled already, this covers pipelines registered in its place.
+    """
+    return [name for name in UNUSED_PIPES if name in nlp.pipe_names]
+
   
   
-def load_config(config_path=None):
-    """Load configuration from a file or fallback to default settings with industry-based flagging."""
+@dataclass(frozen=True)
+class CompiledConfig:
+    """
+    Immutable config made by compile_config or load_config(compiled=True). The industry
+    profile is resolved into frozensets of labels and the sensitive patterns are compiled
+    into one matcher, so the analysis functions do no dict lookups per call. It is
+    hashable and safe to share across threads; fingerprint identifies the settings that
+    change analysis results.
+    """
+    industry: str
+    strictness: str
+    flag_labels: frozenset
+    ignore_labels: frozenset
+    sensitive_patterns: tuple  # (label, regex) pairs in config order
+    whitelist: tuple
+    blacklist_patterns: tuple
+    evaluation_mode: str
+    fingerprint: str = field(compare=False)
+    matcher: PatternMatcher = field(compare=False, repr=False)
+
+
+def compile_config(config):
+    """Turns a config dict (as returned by load_config) into a CompiledConfig."""
+    if isinstance(config, CompiledConfig):
+        return config
+
+    entity_labels = config.get("entity_labels", {})
+    sensitive_patterns = config.get("sensitive_patterns", {})
+    flag_labels = frozenset(entity_labels.get("flag", []))
+    patterns = tuple((label, pattern.get("regex", "")) for label, pattern in sensitive_patterns.items())
+    evaluation_mode = config.get("evaluation_mode", "full")
+
+    return CompiledConfig(
+        industry=config.get("industry", "finance").lower(),
+        strictness=config.get("strictness", "medium"),
+        flag_labels=flag_labels,
+        ignore_labels=frozenset(entity_labels.get("ignore", [])),
+        sensitive_patterns=patterns,
+        whitelist=tuple(config.get("whitelist", [])),
+        blacklist_patterns=tuple(config.get("blacklist_patterns", [])),
+        evaluation_mode=evaluation_mode,
+        fingerprint=_fingerprint(flag_labels, patterns, evaluation_mode),
+        matcher=get_matcher(sensitive_patterns),
+    )
+
+
+def _fingerprint(flag_labels, patterns, evaluation_mode):
+    # Covers every setting analyze_response reads
+    return hashlib.sha1(json.dumps([sorted(flag_labels), patterns, evaluation_mode]).encode("utf-8")).hexdigest()
+
+
+def config_fingerprint(config):
+    """Hash of the settings of a config dict or CompiledConfig that change analysis results."""
+    if isinstance(config, CompiledConfig):
+        return config.fingerprint
+    patterns = [(label, pattern.get("regex", "")) for label, pattern in config.get("sensitive_patterns", {}).items()]
+    return _fingerprint(config.get("entity_labels", {}).get("flag", []), patterns,
+                        config.get("evaluation_mode", "full"))
+
+
+class ResponseCache:
+    """
+    Bounded, thread-safe LRU cache of analyze_response results with an optional TTL
+    (seconds). Entries are keyed by the sha1 of the response text and the fingerprint of
+    the config, so a changed config never gets stale results; invalidate() drops the
+    entries of a config (or all of them) right away instead of waiting for LRU eviction.
+
+        cache = ResponseCache(maxsize=10000, ttl=3600)
+        result = analyze_response(text, config, cache=cache)
+    """
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.entries = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    def key(self, response_text, config):
+        text_hash = hashlib.sha1(response_text.encode("utf-8", "surrogatepass")).hexdigest()
+        return config_fingerprint(config), text_hash
+
+    def get(self, key):
+        result = self.entries.get(key)
+        # Callers may modify the result, the cached one stays untouched
+        return copy.deepcopy(result) if result is not None else None
+
+    def put(self, key, result):
+        if result.get("verdict") != "error":
+            self.entries.put(key, copy.deepcopy(result))
+
+    def invalidate(self, config=None):
+        """Drops the results cached for config, or every result. Returns how many."""
+        if config is None:
+            count = len(self.entries)
+            self.entries.clear()
+            return count
+        fingerprint = config_fingerprint(config)
+        return self.entries.remove(lambda key: key[0] == fingerprint)
+
+    def stats(self):
+        """Size, hit, miss, eviction and expiration counters."""
+        return self.entries.stats()
+
+
+def load_config(config_path=None, compiled=False):
+    """
+    Load configuration from a file or fallback to default settings with industry-based flagging.
+    With compiled=True a CompiledConfig is returned instead of a dict.
+    """
     if config_path and os.path.exists(config_path):
         with open(config_path, "r") as file:
             config = json.load(file)
     else:
-        config = DEFAULT_CONFIG.copy()  # Use defaults if no config provided
+        config = copy.deepcopy(DEFAULT_CONFIG)  # Use defaults if no config provided
 
     # Apply industry-based flagging if an industry is specified
     industry = config.get("industry", "finance").lower()
     if industry in INDUSTRY_PROFILES:
-        config["entity_labels"]["flag"] = INDUSTRY_PROFILES[industry]["flag"]
-        config["entity_labels"]["ignore"] = INDUSTRY_PROFILES[industry]["ignore"]
+        entity_labels = config.setdefault("entity_labels", {})
+        entity_labels["flag"] = list(INDUSTRY_PROFILES[industry]["flag"])
+        entity_labels["ignore"] = list(INDUSTRY_PROFILES[industry]["ignore"])
     else:
         logging.warning(f"Industry '{industry}' not recognized. Using default flags.")
 
-    return config
+    return compile_config(config) if compiled else config
  
 def apply_manual_overrides(config, user_overrides):
     """Allow users to override industry defaults with their own flags."""
@@ -116,29 +248,52 @@ def apply_manual_overrides(config, user_overrides):
     return config
 
 
-def extract_entities(text, config):
-    """Uses NLP to detect named entities that could be sensitive."""
-    doc = nlp(text)
+def extract_entities(text, config, doc=None):
+    """
+    Uses NLP to detect named entities that could be sensitive.
+    doc is an already parsed spaCy Doc of text, as analyze_responses passes it.
+    """
+    if doc is None:
+        nlp = get_nlp()
+        doc = nlp(text, disable=unused_pipes(nlp))
     detected_entities = {}
+    if isinstance(config, CompiledConfig):
+        flag_labels = config.flag_labels
+    else:
+        flag_labels = config.get("entity_labels", {}).get("flag", [])
 
     for ent in doc.ents:
-        if ent.label_ in config.get("entity_labels", {}).get("flag", []):
+        if ent.label_ in flag_labels:
             detected_entities.setdefault(ent.label_, []).append(ent.text)
 
     return detected_entities
  
  
+def _matcher(config):
+    if isinstance(config, CompiledConfig):
+        return config.matcher
+    return get_matcher(config.get("sensitive_patterns", {}))
+
+
 def detect_sensitive_patterns(text, config):
     """Identifies structured sensitive data based on regex patterns."""
     detected_patterns = {}
 
-    for label, pattern in config.get("sensitive_patterns", {}).items():
-        if re.search(pattern.get("regex", ""), text):
-            detected_patterns.setdefault("Structured Data", []).append(label)
+    labels = _matcher(config).labels_in(text)
+    if labels:
+        detected_patterns["Structured Data"] = labels
 
     return detected_patterns
 
 
+def find_sensitive_patterns(text, config):
+    """
+    Like detect_sensitive_patterns, but returns where the data is: a list of
+    {"label", "span", "text"} dicts ordered by position, found in one pass over the text.
+    """
+    return _matcher(config).find(text)
+
+
 def detect_anomalies(response_text):
     """Flags text if it contains unusual patterns that might indicate sensitive leaks."""
     anomalies = []
@@ -151,29 +306,41 @@ def detect_anomalies(response_text):
     return anomalies if anomalies else None
 
 
-def analyze_response(response_text, config):
-    """Performs multi-layered detection to prevent AI data leaks."""
-    
-    issues = {}
+def _cheap_checks(response_text, config):
+    # Tier 1 of analyze_response: regex and anomaly detection, with their timings
+    timings = {}
 
-    try:
-        # Step 1: Regex-based structured detection
-        regex_issues = detect_sensitive_patterns(response_text, config)
-        if regex_issues:
-            issues.update(regex_issues)
+    start = time.perf_counter()
+    regex_issues = detect_sensitive_patterns(response_text, config)
+    timings["regex"] = time.perf_counter() - start
 
-        # Step 2: NLP entity recognition
-        entity_issues = extract_entities(response_text, config)
-        if entity_issues:
-            issues.setdefault("Sensitive Entities", []).append(entity_issues)
+    start = time.perf_counter()
+    anomaly_issues = detect_anomalies(response_text)
+    timings["anomalies"] = time.perf_counter() - start
 
-        # Step 3: Anomaly detection
-        anomaly_issues = detect_anomalies(response_text)
-        if anomaly_issues:
-            issues.setdefault("Anomalies", []).extend(anomaly_issues)
+    return regex_issues, anomaly_issues, timings
 
-    except KeyError as e:
-        return {"verdict": "error", "reason": f"Missing config key: {str(e)}"}
+
+def _needs_ner(config, regex_issues, anomaly_issues):
+    # A regex hit means "block" and an anomaly "flag" whatever NER finds, so in fast mode
+    # NER only runs when the cheap checks found nothing
+    if isinstance(config, CompiledConfig):
+        evaluation_mode = config.evaluation_mode
+    else:
+        evaluation_mode = config.get("evaluation_mode", "full")
+    if evaluation_mode != "fast":
+        return True
+    return not (regex_issues or anomaly_issues)
+
+
+def _verdict(regex_issues, entity_issues, anomaly_issues):
+    issues = {}
+    if regex_issues:
+        issues.update(regex_issues)
+    if entity_issues:
+        issues.setdefault("Sensitive Entities", []).append(entity_issues)
+    if anomaly_issues:
+        issues.setdefault("Anomalies", []).extend(anomaly_issues)
 
     # Step 4: Decide verdict
     if issues:
@@ -181,6 +348,318 @@ def analyze_response(response_text, config):
 
     return {"verdict": "allow", "reason": "No sensitive data found"}
 
+
+def analyze_response(response_text, config, doc=None, cache=None, timings=None):
+    """
+    Performs multi-layered detection to prevent AI data leaks.
+
+    Tier 1 runs the cheap checks (regex, anomalies), tier 2 the spaCy NER. With
+    config["evaluation_mode"] set to "fast" NER is skipped when tier 1 already decided
+    the verdict, "full" (the default) always runs every check for the complete report.
+
+    cache is an optional ResponseCache. timings, when given, is a dict that receives the
+    seconds spent per check ("regex", "anomalies", "ner" unless skipped), or only the
+    lookup time under "cache" for a cached result.
+    """
+
+    if cache is not None:
+        start = time.perf_counter()
+        key = cache.key(response_text, config)
+        result = cache.get(key)
+        if result is not None:
+            if timings is not None:
+                timings["cache"] = time.perf_counter() - start
+            return result
+
+    try:
+        # Step 1 and 3: Regex-based structured detection and anomaly detection
+        regex_issues, anomaly_issues, check_timings = _cheap_checks(response_text, config)
+
+        # Step 2: NLP entity recognition
+        entity_issues = None
+        if _needs_ner(config, regex_issues, anomaly_issues):
+            start = time.perf_counter()
+            entity_issues = extract_entities(response_text, config, doc)
+            check_timings["ner"] = time.perf_counter() - start
+
+    except KeyError as e:
+        return {"verdict": "error", "reason": f"Missing config key: {str(e)}"}
+
+    if timings is not None:
+        timings.update(check_timings)
+    result = _verdict(regex_issues, entity_issues, anomaly_issues)
+    if cache is not None:
+        cache.put(key, result)
+    return result
+
+
+def analyze_responses(texts, config, batch_size=64, n_process=1, cache=None, timings=None):
+    """
+    analyze_response for many responses at once. The texts go through spaCy with
+    nlp.pipe in batches of batch_size, on n_process processes, with the components
+    NER does not need disabled. In fast evaluation mode only the texts the cheap checks
+    could not decide are parsed. Returns one verdict per text, in input order.
+
+    With a ResponseCache, cached texts are not analyzed again and repeated texts of the
+    batch are analyzed once. timings, when given, is a list that receives one dict of
+    timings per text as analyze_response reports them; "ner" is the mean time per
+    parsed text.
+    """
+    texts = list(texts)
+    if cache is not None:
+        return _analyze_cached(texts, config, batch_size, n_process, cache, timings)
+
+    checked = [_cheap_checks(text, config) for text in texts]
+    parse = [text for text, (regex_issues, anomaly_issues, _) in zip(texts, checked)
+             if _needs_ner(config, regex_issues, anomaly_issues)]
+
+    entities = []
+    if parse:
+        nlp = get_nlp()
+        start = time.perf_counter()
+        docs = nlp.pipe(parse, batch_size=batch_size, n_process=n_process, disable=unused_pipes(nlp))
+        entities = [extract_entities(text, config, doc) for text, doc in zip(parse, docs)]
+        ner_time = (time.perf_counter() - start) / len(parse)
+
+    entities = iter(entities)
+    results = []
+    for regex_issues, anomaly_issues, check_timings in checked:
+        entity_issues = None
+        if _needs_ner(config, regex_issues, anomaly_issues):
+            entity_issues = next(entities)
+            check_timings["ner"] = ner_time
+        if timings is not None:
+            timings.append(check_timings)
+        results.append(_verdict(regex_issues, entity_issues, anomaly_issues))
+    return results
+
+
+def _analyze_cached(texts, config, batch_size, n_process, cache, timings):
+    results = []
+    misses = {}  # key -> text, one per distinct text
+    for text in texts:
+        start = time.perf_counter()
+        key = cache.key(text, config)
+        result = cache.get(key)
+        if result is None:
+            misses.setdefault(key, text)
+            lookup = None
+        else:
+            lookup = {"cache": time.perf_counter() - start}
+        results.append((key, result, lookup))
+
+    miss_timings = []
+    computed = dict(zip(misses, analyze_responses(list(misses.values()), config, batch_size, n_process,
+                                                  timings=miss_timings)))
+    miss_timings = dict(zip(misses, miss_timings))
+    for key, result in computed.items():
+        cache.put(key, result)
+    if timings is not None:
+        timings.extend(lookup or dict(miss_timings[key]) for key, _, lookup in results)
+    return [result if result is not None else copy.deepcopy(computed[key]) for key, result, _ in results]
+
+
+class StreamingAnalyzer:
+    """
+    Runs the regex, anomaly and canary checks of analyze_response over a response while
+    it is generated, so it can be streamed to the user instead of buffered.
+
+        analyzer = StreamingAnalyzer(config, canary_tokens=[token])
+        for chunk in generation:
+            analyzer.feed(chunk)
+            if analyzer.blocked:
+                break
+            send(analyzer.release())
+        result = analyzer.close()
+        if not analyzer.blocked:
+            send(analyzer.release())
+
+    feed() returns the "safe to flush" offset: the text before it has passed the checks.
+    release() returns the text up to that offset that was not released yet, it only
+    touches the unreleased tail, so streaming a response stays linear in its length.
+    Only a short tail is held back: the last holdback characters, the word being written
+    and any regex match the next chunk could still change. When a sensitive pattern has a
+    lookahead, such as the default password regex, the line being written is held back
+    too, since text later on the line can turn it into a match. Either is held back for
+    at most max_holdback characters.
+    A sensitive pattern or canary token blocks the response as soon as it is seen, the
+    offset then stops moving. Anomalies only turn the final verdict into "flag", as in
+    analyze_response. NER is not run, it needs the whole response.
+
+    The regexes run over a sliding window that overlaps the previous one by holdback
+    characters and keeps at most max_holdback + holdback characters of the current word
+    or line, so every feed costs about the same whatever the output looks like. Matches
+    longer than holdback can be missed when a chunk boundary falls inside them, and a
+    line or word longer than max_holdback is flushed before a match it holds is known.
+    """
+
+    # Characters of left context kept before the window for word boundaries and lookbehinds
+    CONTEXT = 16
+
+    def __init__(self, config, canary_tokens=(), holdback=32, max_holdback=256):
+        self.config = config
+        self.matcher = _matcher(config)
+        self.canary_tokens = [token for token in canary_tokens if token]
+        self.holdback = max([holdback] + [len(token) for token in self.canary_tokens])
+        self.max_holdback = max(max_holdback, self.holdback)
+        self.flushed = 0
+        self.length = 0
+        self.blocked = False
+        self.closed = False
+        self.issues = {}
+        self.matches = []        # {"label", "span", "text"} of every sensitive match
+        self.released = 0
+        self._chunks = []
+        self._unreleased = []    # chunks of the text from self.released on
+        self._buffer = ""        # the text from self._offset on
+        self._offset = 0
+        self._scan_from = 0      # matches starting before this were checked already
+        self._word_start = 0     # start of the word that is not complete yet
+        self._word_head = []     # start of that word when it outgrew the window
+        self._line_start = 0     # start of the line that is not complete yet
+        self._canary_end = 0     # canary tokens were searched up to here
+        self._reported = {}      # label -> end of its last reported match
+        # Patterns with a lookahead can match once text further on the line is known, they
+        # are checked apart from the others, see _check_lines
+        self._line_patterns = [(label, pattern) for label, pattern in zip(self.matcher.labels, self.matcher.patterns)
+                               if "(?=" in pattern.pattern or "(?!" in pattern.pattern]
+        if self._line_patterns:
+            self.matcher = PatternMatcher([(label, pattern.pattern)
+                                           for label, pattern in zip(self.matcher.labels, self.matcher.patterns)
+                                           if (label, pattern) not in self._line_patterns])
+
+    @property
+    def text(self) -> str:
+        """The response received so far. Joins every chunk, use release() while streaming."""
+        return "".join(self._chunks)
+
+    def release(self) -> str:
+        """The text that became safe to flush since the last call."""
+        pending = "".join(self._unreleased)
+        count = self.flushed - self.released
+        self._unreleased = [pending[count:]] if count < len(pending) else []
+        self.released = self.flushed
+        return pending[:count]
+
+    def feed(self, chunk: str) -> int:
+        """Adds a chunk of the response and returns the offset that is safe to flush."""
+        if self.closed:
+            raise ValueError("StreamingAnalyzer is closed")
+        if not self.blocked:
+            self._chunks.append(chunk)
+            self._unreleased.append(chunk)
+            self.length += len(chunk)
+            self._buffer += chunk
+            self._check(final=False)
+        return self.flushed
+
+    def close(self) -> dict:
+        """Ends the response and returns an analyze_response style verdict."""
+        if not self.closed:
+            if not self.blocked:
+                self._check(final=True)
+            self.closed = True
+
+        result = {"flushed": self.flushed}
+        if self.blocked:
+            result.update(verdict="block", reasons=self.issues, matches=self.matches)
+        elif self.issues:
+            result.update(verdict="flag", reasons=self.issues)
+        else:
+            result.update(verdict="allow", reason="No sensitive data found")
+        return result
+
+    def _check(self, final):
+        buffer = self._buffer
+        offset = self._offset
+        end = offset + len(buffer)
+        safe = end if final else end - self.holdback
+        newline = buffer.rfind("\n")
+        if newline >= 0:
+            self._line_start = max(self._line_start, offset + newline + 1)
+
+        # Regex-based structured detection
+        for match in self.matcher.find(buffer, self._scan_from - offset):
+            start, stop = (offset + i for i in match["span"])
+            if stop == end and not final:
+                # The next chunk may still extend or undo it, e.g. \bfoo\b followed by 'bar'
+                safe = min(safe, start)
+                continue
+            if start < self._reported.get(match["label"], 0):
+                continue  # seen in the previous window
+            self._reported[match["label"]] = stop
+            self._report(match["label"], start, stop, match["text"])
+
+        # Canary tokens, in the text not searched yet and the len(token) - 1 characters before
+        for token in self.canary_tokens:
+            if check_for_canary_leak(buffer[max(self._canary_end - len(token) + 1 - offset, 0):], token):
+                tokens = self.issues.setdefault("Canary Tokens", [])
+                if token not in tokens:
+                    tokens.append(token)
+                self.blocked = True
+        self._canary_end = end
+
+        # Anomaly detection on the words completed by this chunk
+        cut = len(buffer)
+        if not final and buffer and not buffer[-1].isspace():
+            cut -= len(buffer.rsplit(None, 1)[-1])
+        if cut > self._word_start - offset:
+            words = buffer[self._word_start - offset:cut]
+            if self._word_head:
+                words = "".join(self._word_head) + words
+                self._word_head = []
+            anomalies = detect_anomalies(words)
+            if anomalies:
+                self.issues.setdefault("Anomalies", []).extend(anomalies)
+            self._word_start = offset + cut
+
+        if self.blocked:
+            return
+
+        # The word being written is held back as well, up to max_holdback characters
+        safe = min(max(min(safe, self._word_start), end - self.max_holdback), end)
+        self._scan_from = max(self._scan_from, safe - self.holdback)
+        if self._line_patterns:
+            # So is the line being written, and lookahead patterns are checked where they
+            # start in the text about to be flushed
+            if not final:
+                safe = min(safe, max(self._line_start, end - self.max_holdback))
+            self._check_lines(buffer, offset, safe)
+            if self.blocked:
+                return
+        self.flushed = max(self.flushed, safe)
+
+        # Slide the window: keep holdback characters before the scan and flush offsets
+        keep = min(self._scan_from, self.flushed) - self.CONTEXT
+        if self._word_start < keep:
+            if end - self._word_start <= self.max_holdback + self.holdback:
+                keep = self._word_start
+            else:
+                # A word without whitespace in sight (base64, URLs): set its start aside
+                self._word_head.append(buffer[self._word_start - offset:keep - offset])
+                self._word_start = keep
+        if keep > offset:
+            self._buffer = buffer[keep - offset:]
+            self._offset = keep
+
+    def _check_lines(self, buffer, offset, safe):
+        # Lookahead patterns at every start position between the flush offset and safe,
+        # each position is checked once, with the text received so far after it
+        for label, pattern in self._line_patterns:
+            for pos in range(self.flushed - offset, safe - offset):
+                match = pattern.match(buffer, pos)
+                if match is not None:
+                    self._report(label, offset + match.start(), offset + match.end(), match.group())
+                    break
+
+    def _report(self, label, start, stop, text):
+        self.matches.append({"label": label, "span": (start, stop), "text": text})
+        labels = self.issues.setdefault("Structured Data", [])
+        if label not in labels:
+            labels.append(label)
+        self.blocked = True
+
+
 def main():
     usage = """
     Usage:
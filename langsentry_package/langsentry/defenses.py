@@ -1,24 +1,29 @@
 # Done by Keith 
+import bisect
+import logging
 import random
 import uuid
 import re
-import spacy
+import time
 from datetime import datetime
-from transformers import pipeline, AutoModelForSeq2SeqLM, AutoTokenizer
-from langsentry.check_output import DEFAULT_CONFIG, INDUSTRY_PROFILES, load_config, analyze_response
-
-nlp = spacy.load("en_core_web_sm")
-ner_pipeline = pipeline("ner", model="dslim/bert-base-NER")
-summarizer_tokenizer = AutoTokenizer.from_pretrained("facebook/bart-large-cnn")
-summary_model = AutoModelForSeq2SeqLM.from_pretrained("facebook/bart-large-cnn")
-classifier = pipeline(
-    "text-classification",
-    model="roberta-large-mnli",
-    tokenizer="roberta-large-mnli"
-)
-
-address_generator = pipeline("text-generation", model="GPT2")
-domain_generator = pipeline("text-generation", model="GPT2")
+from langsentry.check_output import DEFAULT_CONFIG, INDUSTRY_PROFILES, load_config, analyze_response, unused_pipes
+from langsentry.models import MODELS
+from langsentry.patients import PatientMapping
+from langsentry.pseudonyms import PSEUDONYMS, PseudonymStore
+from langsentry.safety import SAFETY, SafetyClassifier
+from langsentry.surrogates import SURROGATES
+
+# Models are loaded from the shared registry on first use. MODELS.prewarm() loads
+# them ahead of the first request and MODELS.release_idle() frees unused ones.
+_MODEL_NAMES = ("nlp", "ner_pipeline", "summarizer_tokenizer", "summary_model",
+                "classifier", "address_generator", "domain_generator")
+
+
+def __getattr__(name):
+    # Keep the old module attributes (defenses.nlp, defenses.classifier, ...) working
+    if name in _MODEL_NAMES:
+        return MODELS.get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 WHITELIST = [
     "HealthBot",
@@ -168,14 +173,11 @@ CULTURES = {
     }
 }
 
-PERSON_REPLACEMENTS = {}
-EMAIL_REPLACEMENTS = {}
-
 def build_patient_mapping(config):
     mapping = {}
     db = config.get("healthcare_database")
     if not db or "patients" not in db:
-        return mapping
+        return PatientMapping()
 
     for patient in db["patients"]:
         original_name = patient.get("name", "")
@@ -189,23 +191,7 @@ def build_patient_mapping(config):
         # Store both keys in the mapping so that a lookup by name OR email works.
         mapping[norm_name] = (fake_name, fake_email)
         mapping[norm_email] = (fake_name, fake_email)
-    return mapping
-
-def generate_valid_output(generator, prompt, pattern, max_new_tokens, default, max_attempts=5, temperature=0.5):
-    for _ in range(max_attempts):
-        result = generator(
-            prompt,
-            max_new_tokens=max_new_tokens,
-            truncation=True,
-            pad_token_id=50256,
-            num_return_sequences=1,
-            do_sample=True,
-            temperature=temperature
-        )[0]['generated_text']
-        text = result[len(prompt):].strip().split("\n")[0]
-        if re.match(pattern, text):
-            return text
-    return default
+    return PatientMapping(mapping)
 
 def generate_fake_name():
     gender = random.choice(["male", "female"])
@@ -223,20 +209,15 @@ def normalize_name(name_text):
     name_text = re.sub(r'\s+', ' ', name_text).strip()
     return name_text
 
+# Organisations, places and addresses come from the pools in surrogates.json, not GPT-2
 def generate_fake_org():
-    prompt = "Output a realistic company name: "
-    pattern = r'^[A-Z][A-Za-z0-9]+( [A-Z][A-Za-z0-9]+)?$'
-    return generate_valid_output(name_generator, prompt, pattern, max_new_tokens=5, default="ExampleCorp")
+    return SURROGATES.get("org")
 
 def generate_fake_location():
-    prompt = "Output a realistic city name: "
-    pattern = r'^[A-Z][a-z]+$'
-    return generate_valid_output(name_generator, prompt, pattern, max_new_tokens=5, default="Springfield")
+    return SURROGATES.get("location")
 
 def generate_fake_address():
-    prompt = "Output a realistic street address: "
-    pattern = r'^\d+ [A-Z][a-zA-Z ]+$'
-    return generate_valid_output(address_generator, prompt, pattern, max_new_tokens=10, default="123 Main Street")
+    return SURROGATES.get("address")
 
 def generate_fake_email(fake_name):
     domains = ["gmail.com", "yahoo.com", "hotmail.com", "outlook.com"]
@@ -244,27 +225,48 @@ def generate_fake_email(fake_name):
     email_username = fake_name.lower().replace(" ", "_")
     return f"{email_username}@{domain}"
 
+def pseudonym_store(config):
+    # Pseudonyms made on the fly live in the config's store (or the shared one) under
+    # the config's tenant. config["patient_mapping"] only holds the database patients.
+    return config.get("pseudonym_store", PSEUDONYMS), config.get("tenant", "default")
+
+def patient_index(config):
+    # build_patient_mapping returns an indexed PatientMapping, a plain dict is indexed once here
+    patient_mapping = config.get("patient_mapping", {})
+    if not isinstance(patient_mapping, PatientMapping):
+        patient_mapping = PatientMapping(patient_mapping)
+        if "patient_mapping" in config:
+            config["patient_mapping"] = patient_mapping
+    return patient_mapping
+
+def new_pseudonym():
+    fake_name = generate_fake_name()
+    return (fake_name, generate_fake_email(fake_name))
+
 def generate_fake_email_from_original(original_email, config):
-    if original_email in EMAIL_REPLACEMENTS:
-        return EMAIL_REPLACEMENTS[original_email]
+    store, tenant = pseudonym_store(config)
 
-    username, _, _ = original_email.partition("@")
-    candidate_key = normalize_name(username)
+    def fake_email():
+        username, _, _ = original_email.partition("@")
+        candidate_key = normalize_name(username)
 
-    # Try to find an existing fake name (and email) for this candidate key in the patient mapping.
-    patient_mapping = config.get("patient_mapping", {})
-    for norm_name, (fake_name, fake_email) in patient_mapping.items():
-        if candidate_key in norm_name or norm_name in candidate_key:
-            EMAIL_REPLACEMENTS[original_email] = fake_email
+        # Try to find an existing fake name (and email) for this candidate key in the patient mapping.
+        match = patient_index(config).find(candidate_key)
+        if match is not None:
+            _, (fake_name, fake_email) = match
             return fake_email
 
-    # Will generate a new fake name and email if no match found
-    new_fake_name = generate_fake_name()
-    new_fake_email = generate_fake_email(new_fake_name)
-    patient_mapping[candidate_key] = (new_fake_name, new_fake_email)
-    config["patient_mapping"] = patient_mapping
-    EMAIL_REPLACEMENTS[original_email] = new_fake_email
-    return new_fake_email
+        # Otherwise the fake person of an earlier key that contains this one or is contained
+        # in it, as for the patients, e.g. jsmith2@... gets the person of jsmith@...
+        match = store.find("person", candidate_key, tenant)
+        if match is not None:
+            _, (fake_name, fake_email) = match
+            return fake_email
+
+        # Otherwise a new fake person for this key
+        return store.get_or_create("person", candidate_key, new_pseudonym, tenant)[1]
+
+    return store.get_or_create("email", original_email, fake_email, tenant)
 
 def generate_fake_credit_card():
     card_type = random.choice(["Visa", "MasterCard", "American Express"])
@@ -339,15 +341,22 @@ def corrupt_string(s, digit_rate=0.65, letter_rate=0.4, special_sub_rate=0.55):
             result.append(char)
     return "".join(result)
 
-def is_dangerous(output):
-    result = classifier(output, truncation=True)
-    return result[0]['label'] == "DANGEROUS"
-
-def self_heal_output(output):
-    if is_dangerous(output):
+def is_dangerous(output, classifier=None):
+    return (classifier or SAFETY).classify(output)["dangerous"]
+
+def self_heal_output(output, classifier=None, timings=None):
+    # timings, when given, receives the seconds spent per stage
+    result = (classifier or SAFETY).classify(output)
+    if timings is not None:
+        timings.update(result["timings"])
+    if result["dangerous"]:
+        start = time.perf_counter()
+        summarizer_tokenizer = MODELS.get("summarizer_tokenizer")
         inputs = summarizer_tokenizer(output, return_tensors="pt", truncation=True, max_length=512)
-        summary_ids = summary_model.generate(inputs["input_ids"], max_new_tokens=50, early_stopping=True)
-        return summarizer_tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+        summary_ids = MODELS.get("summary_model").generate(inputs["input_ids"], max_new_tokens=50, early_stopping=True)
+        output = summarizer_tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+        if timings is not None:
+            timings["summarize"] = time.perf_counter() - start
     return output
 
 def honeypot_data(input_text, config):
@@ -356,61 +365,125 @@ def honeypot_data(input_text, config):
             return f"Fake API Key: {uuid.uuid4()}"
     return None
 
+# Regex rules of segregate_sensitive_info, highest priority first. Where detected spans
+# overlap only the one with the highest priority is replaced: these rules, then the
+# spaCy entities. The password pattern of the config comes last and is only searched
+# in the text between the spans that were kept.
+REDACTION_PATTERNS = [
+    ("email", re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b')),
+    ("credit_card", re.compile(r'\b(?:\d{4}-){3}\d{4}\b|\b\d{4} \d{6} \d{5}\b')),
+    ("date", re.compile(r'\b(\d{1,2}/\d{1,2}/\d{4})\b')),
+    ("phone", re.compile(r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}')),
+    ("address", re.compile(r'\b\d+\s+[A-Z][a-zA-Z ]+\b')),
+]
+ENTITY_PRIORITY = len(REDACTION_PATTERNS)
+
+def select_spans(candidates):
+    """
+    Resolves overlapping (priority, start, end, replace) candidates, a lower priority
+    number wins. Returns the kept (start, end, replace) spans ordered by position.
+    """
+    starts, ends, kept = [], [], []
+    for priority, start, end, replace in sorted(candidates, key=lambda candidate: candidate[:2]):
+        i = bisect.bisect_right(starts, start)
+        if (i > 0 and ends[i - 1] > start) or (i < len(starts) and starts[i] < end):
+            continue
+        starts.insert(i, start)
+        ends.insert(i, end)
+        kept.insert(i, (start, end, replace))
+    return kept
+
+def rewrite_spans(text, spans):
+    """Builds the output in one pass, each (start, end, replace) span becomes replace(span text)."""
+    parts = []
+    pos = 0
+    for start, end, replace in spans:
+        parts.append(text[pos:start])
+        parts.append(replace(text[start:end]))
+        pos = end
+    parts.append(text[pos:])
+    return "".join(parts)
+
+def spans_in_gaps(pattern, text, spans, replace):
+    """
+    (start, end, replace) spans of the pattern's matches in the text between the kept
+    spans, which the earlier replacements would have removed from the text.
+    """
+    gaps = zip([0] + [end for _, end, _ in spans], [start for start, _, _ in spans] + [len(text)])
+    return [(m.start(), m.end(), replace)
+            for gap_start, gap_end in gaps if gap_start < gap_end
+            for m in pattern.finditer(text, gap_start, gap_end)]
+
 def segregate_sensitive_info(text, config):
     if "patient_mapping" not in config:
         config["patient_mapping"] = build_patient_mapping(config)
     patient_mapping = config["patient_mapping"]
 
-    
-    email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
-    text = re.sub(email_pattern, lambda m: generate_fake_email_from_original(m.group(), config), text)
-    
-    date_pattern = r'\b(\d{1,2}/\d{1,2}/\d{4})\b'
-    text = re.sub(date_pattern, lambda m: generate_fake_birthdate(), text)
-    
-    address_pattern = r'\b\d+\s+[A-Z][a-zA-Z ]+\b'
-    text = re.sub(address_pattern, lambda m: generate_fake_address(), text)
-    
-    phone_pattern = r'(\+?\d{1,3}[-.\s]?)?\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-    text = re.sub(phone_pattern, lambda m: generate_fake_phone(), text)
-    
-    cc_pattern = r'\b(?:\d{4}-){3}\d{4}\b|\b\d{4} \d{6} \d{5}\b'
-    text = re.sub(cc_pattern, lambda m: generate_fake_credit_card(), text)
-    
-    doc = nlp(text)
+    # Detection phase: every span is found on the original text, nothing is replaced yet
+    replacers = {
+        "email": lambda original: generate_fake_email_from_original(original, config),
+        "credit_card": lambda original: generate_fake_credit_card(),
+        "date": lambda original: generate_fake_birthdate(),
+        "phone": lambda original: generate_fake_phone(),
+        "address": lambda original: generate_fake_address(),
+    }
+    candidates = []
+    for priority, (name, pattern) in enumerate(REDACTION_PATTERNS):
+        for m in pattern.finditer(text):
+            candidates.append((priority, m.start(), m.end(), replacers[name]))
+
+    store, tenant = pseudonym_store(config)
+    # The same organisation or place gets the same fake value throughout the text
+    fakes = {}
+
+    def replace_person(original):
+        norm_ent = normalize_name(original)
+        if norm_ent in patient_mapping:
+            fake_name, _ = patient_mapping[norm_ent]
+        else:
+            fake_name, _ = store.get_or_create("person", norm_ent, new_pseudonym, tenant)
+        return fake_name
+
+    def replace_org(original):
+        if ("ORG", original) not in fakes:
+            fakes["ORG", original] = generate_fake_org()
+        return fakes["ORG", original]
+
+    def replace_location(original):
+        if ("GPE", original) not in fakes:
+            fakes["GPE", original] = generate_fake_location()
+        return fakes["GPE", original]
+
+    entity_replacers = {"PERSON": replace_person, "ORG": replace_org, "GPE": replace_location}
+    nlp = MODELS.get("nlp")
+    doc = nlp(text, disable=unused_pipes(nlp))
     for ent in doc.ents:
-        print(f"  Detected entity: '{ent.text}' (label: {ent.label_})")
-        
+        # Entities are PII, they only go to the debug log
+        logging.debug("Detected entity: %r (label: %s)", ent.text, ent.label_)
+
         whitelisted_term = None
         for w in WHITELIST:
             if w.lower() in ent.text.lower():
                 whitelisted_term = w
                 break
-        
+
         if whitelisted_term:
-            print(f"  -> '{ent.text}' contains whitelisted term '{whitelisted_term}'. Skipping replacement.")
+            logging.debug("%r contains whitelisted term %r, skipping replacement", ent.text, whitelisted_term)
             continue
 
-        if ent.label_ == "PERSON":
-            norm_ent = normalize_name(ent.text)
-            if norm_ent in patient_mapping:
-                fake_name, _ = patient_mapping[norm_ent]
-            else:
-                fake_name = generate_fake_name()
-                patient_mapping[norm_ent] = (fake_name, generate_fake_email(fake_name))
-            PERSON_REPLACEMENTS[norm_ent] = fake_name
-            text = text.replace(ent.text, fake_name)
-        elif ent.label_ == "ORG":
-            text = text.replace(ent.text, generate_fake_org())
-        elif ent.label_ == "GPE":
-            text = text.replace(ent.text, generate_fake_location())
+        if ent.label_ in entity_replacers:
+            candidates.append((ENTITY_PRIORITY, ent.start_char, ent.end_char, entity_replacers[ent.label_]))
+
+    spans = select_spans(candidates)
 
     password_conf = config.get("sensitive_patterns", {}).get("password", {})
     password_regex = password_conf.get("regex")
     if password_regex:
-        text = re.sub(password_regex, lambda m: corrupt_string(m.group()), text)
+        spans = sorted(spans + spans_in_gaps(re.compile(password_regex), text, spans, corrupt_string),
+                       key=lambda span: span[0])
 
-    return text
+    # Rewrite phase: output built left to right
+    return rewrite_spans(text, spans)
 
 class LangSentry:
     def __init__(self, llm, config=None):
@@ -419,6 +492,16 @@ class LangSentry:
             self.config = load_config()
         else:
             self.config = config
+        # A "safety" section in the config sets up a SafetyClassifier with other settings
+        if "safety" in self.config:
+            self.safety = SafetyClassifier(**self.config["safety"])
+        else:
+            self.safety = SAFETY
+        # A "pseudonyms" section gives this instance its own PseudonymStore (maxsize, ttl, path),
+        # set on a copy so the caller's config and other instances built from it keep theirs
+        if "pseudonyms" in self.config and "pseudonym_store" not in self.config:
+            self.config = dict(self.config, pseudonym_store=PseudonymStore(**self.config["pseudonyms"]))
+        self.last_timings = {}
 
     def process_input(self, input_text):
         # Whitelist the system prompt
@@ -432,6 +515,7 @@ class LangSentry:
             return honeypot
 
         output = self.llm.generate(input_text)
-        output = self_heal_output(output)
+        self.last_timings = {}
+        output = self_heal_output(output, self.safety, self.last_timings)
         output = segregate_sensitive_info(output, self.config)
         return output
@@ -0,0 +1,133 @@
+import argparse
+import os
+
+import numpy as np
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+HF_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+ONNX_PATH = "all-MiniLM-L6-v2.onnx"
+ONNX_INT8_PATH = "all-MiniLM-L6-v2.int8.onnx"
+
+# torch: SentenceTransformer in PyTorch (default)
+# onnx:  the same model exported to ONNX and run with onnxruntime, optionally int8-quantized
+BACKENDS = ("torch", "onnx")
+
+
+class OnnxEncoder:
+    """
+    Sentence encoder running an exported all-MiniLM-L6-v2 through onnxruntime on CPU.
+
+    Reproduces the SentenceTransformer pipeline (tokenize, transformer, mean pooling,
+    L2 normalization), so encode() is a drop-in replacement for SentenceTransformer.encode().
+    cache_name and lowercase_chunks tell the chunk cache of similarity.py which model this
+    is and whether its tokenizer ignores case.
+    """
+
+    def __init__(self, model_path=ONNX_PATH, tokenizer_name=HF_MODEL_NAME, max_length=256, batch_size=32,
+                 threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+        self.max_length = max_length
+        self.batch_size = batch_size
+        self.cache_name = f"onnx:{os.path.abspath(model_path)}"
+        self.lowercase_chunks = bool(getattr(self.tokenizer, "do_lower_case", False))
+
+    def encode(self, sentences, batch_size=None, **kwargs):
+        if isinstance(sentences, str):
+            return self.encode([sentences], batch_size)[0]
+        batch_size = batch_size or self.batch_size
+        if not sentences:
+            return np.empty((0, 384), dtype=np.float32)
+
+        # Longest first, as SentenceTransformer does, so batches carry little padding
+        order = sorted(range(len(sentences)), key=lambda i: -len(sentences[i]))
+        out = np.empty((len(sentences), 0), dtype=np.float32)
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            tokens = self.tokenizer([sentences[i] for i in rows], padding=True, truncation=True,
+                                    max_length=self.max_length, return_tensors="np")
+            feeds = {name: tokens[name].astype(np.int64) for name in self.input_names if name in tokens}
+            hidden = self.session.run(None, feeds)[0]
+            pooled = mean_pool(hidden, tokens["attention_mask"])
+            if out.shape[1] != pooled.shape[1]:
+                out = np.empty((len(sentences), pooled.shape[1]), dtype=np.float32)
+            out[rows] = pooled
+        return out
+
+
+def mean_pool(hidden, attention_mask):
+    # Mean over the real tokens, then unit length, as in the SentenceTransformer model
+    mask = attention_mask[..., np.newaxis].astype(np.float32)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled.astype(np.float32)
+
+
+def export_onnx(path=ONNX_PATH, model_name=HF_MODEL_NAME, quantize=True):
+    """
+    Export the transformer of all-MiniLM-L6-v2 to ONNX and, with quantize=True, also write
+    a dynamically int8-quantized copy. Returns the path of the model to load.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic = {name: {0: "batch", 1: "sequence"} for name in names}
+    dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[name] for name in names), path, input_names=names,
+                          output_names=["last_hidden_state"], dynamic_axes=dynamic, opset_version=17)
+    print(f"Exported {model_name} to {path}")
+    if not quantize:
+        return path
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    quantized_path = os.path.splitext(path)[0] + ".int8.onnx"
+    quantize_dynamic(path, quantized_path, weight_type=QuantType.QInt8)
+    print(f"Quantized model saved to {quantized_path}")
+    return quantized_path
+
+
+def load_encoder(backend="torch", onnx_path=None, model_name=MODEL_NAME, **kwargs):
+    """
+    Return a sentence encoder with a SentenceTransformer-compatible encode() for the backend.
+    For torch, model_name may also be a local SentenceTransformer directory. For onnx,
+    onnx_path defaults to the int8 model if it exists, otherwise the float model.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}'. Expected one of {BACKENDS}")
+
+    if backend == "torch":
+        from sentence_transformers import SentenceTransformer
+        model = SentenceTransformer(model_name)
+        model.cache_name = f"torch:{model_name}"
+        model.lowercase_chunks = bool(getattr(model.tokenizer, "do_lower_case", False))
+        return model
+
+    if onnx_path is None:
+        onnx_path = ONNX_INT8_PATH if os.path.exists(ONNX_INT8_PATH) else ONNX_PATH
+    if not os.path.exists(onnx_path):
+        raise FileNotFoundError(f"ONNX model '{onnx_path}' not found. Create it with "
+                                f"'python -m langsentry.encoders export'")
+    return OnnxEncoder(onnx_path, **kwargs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentence encoder backends")
+    parser.add_argument("command", choices=["export"])
+    parser.add_argument("--path", type=str, default=ONNX_PATH)
+    parser.add_argument("--model", type=str, default=HF_MODEL_NAME, help="Hugging Face name or local directory")
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+    export_onnx(args.path, args.model, quantize=not args.no_quantize)
@@ -1,13 +1,21 @@
-from google import genai
-from google.genai import types
+# The client is created on first use so importing langsentry does not need
+# google-genai or the API key from config.py
+_client = None
 
-from config import MAKERSUITE_API_KEY
 
-client = genai.Client(api_key=MAKERSUITE_API_KEY)
+def get_client():
+    global _client
+    if _client is None:
+        from google import genai
+        from config import MAKERSUITE_API_KEY
+        _client = genai.Client(api_key=MAKERSUITE_API_KEY)
+    return _client
 
 
 def prompt_gemini(user_message, system_prompt=None):
-    response = client.models.generate_content(
+    from google.genai import types
+
+    response = get_client().models.generate_content(
         model="gemini-2.0-flash",
         config=types.GenerateContentConfig(system_instruction=system_prompt),
         contents=[user_message],
@@ -0,0 +1,137 @@
+import threading
+import time
+
+
+class ModelRegistry:
+    """
+    Loads models on first use and shares them between callers.
+
+    Every model is registered under a name together with a key that identifies the
+    underlying weights. Names with the same key share one loaded instance, so for
+    example two GPT-2 text generation pipelines are only loaded once.
+    """
+
+    def __init__(self):
+        self._keys = {}      # name -> key
+        self._loaders = {}   # key -> loader
+        self._models = {}    # key -> loaded model
+        self._last_used = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, key, loader):
+        with self._lock:
+            self._keys[name] = key
+            self._loaders.setdefault(key, loader)
+            self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, name):
+        key = self._keys[name]
+        # One lock per key, loading a large model does not block the others. The use is
+        # recorded under the same lock, so release_idle cannot drop a model between the
+        # lookup and the new timestamp.
+        with self._key_locks[key]:
+            model = self._models.get(key)
+            if model is None:
+                model = self._loaders[key]()
+                self._models[key] = model
+            self._last_used[key] = time.monotonic()
+        return model
+
+    def is_loaded(self, name):
+        return self._keys[name] in self._models
+
+    def loaded(self):
+        """Names whose model is currently in memory."""
+        return [name for name, key in self._keys.items() if key in self._models]
+
+    def prewarm(self, names=None, background=True):
+        """
+        Load the given models (all registered ones by default) ahead of the first request.
+        With background=True the loading runs in a daemon thread, which is returned.
+        """
+        names = list(self._keys) if names is None else list(names)
+
+        def load():
+            for name in names:
+                self.get(name)
+
+        if not background:
+            load()
+            return None
+        thread = threading.Thread(target=load, name="langsentry-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def release(self, name):
+        key = self._keys[name]
+        with self._key_locks[key]:
+            self._models.pop(key, None)
+            self._last_used.pop(key, None)
+
+    def release_idle(self, max_idle):
+        """Drop every model not used in the last max_idle seconds. Returns the released keys."""
+        released = []
+        for key, last_used in list(self._last_used.items()):
+            if time.monotonic() - last_used > max_idle:
+                # Checked again under the key lock, a get() may have used it since
+                with self._key_locks[key]:
+                    last_used = self._last_used.get(key)
+                    if last_used is not None and time.monotonic() - last_used > max_idle:
+                        self._models.pop(key, None)
+                        self._last_used.pop(key, None)
+                        released.append(key)
+        return released
+
+    def start_idle_reaper(self, max_idle, interval=60):
+        """Call release_idle(max_idle) every interval seconds from a daemon thread."""
+        def reap():
+            while True:
+                time.sleep(interval)
+                self.release_idle(max_idle)
+
+        thread = threading.Thread(target=reap, name="langsentry-idle-reaper", daemon=True)
+        thread.start()
+        return thread
+
+
+# Pipeline components of en_core_web_sm that NER does not need, only doc.ents is used
+UNUSED_PIPES = ("tagger", "parser", "attribute_ruler", "lemmatizer", "senter")
+
+
+def _load_spacy():
+    import spacy
+    return spacy.load("en_core_web_sm", disable=UNUSED_PIPES)
+
+
+def _load_pipeline(task, model, **kwargs):
+    def load():
+        from transformers import pipeline
+        return pipeline(task, model=model, **kwargs)
+    return load
+
+
+def _load_tokenizer(model):
+    def load():
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model)
+    return load
+
+
+def _load_seq2seq(model):
+    def load():
+        from transformers import AutoModelForSeq2SeqLM
+        return AutoModelForSeq2SeqLM.from_pretrained(model)
+    return load
+
+
+MODELS = ModelRegistry()
+MODELS.register("nlp", ("spacy", "en_core_web_sm"), _load_spacy)
+MODELS.register("ner_pipeline", ("ner", "dslim/bert-base-NER"), _load_pipeline("ner", "dslim/bert-base-NER"))
+MODELS.register("summarizer_tokenizer", ("tokenizer", "facebook/bart-large-cnn"), _load_tokenizer("facebook/bart-large-cnn"))
+MODELS.register("summary_model", ("seq2seq", "facebook/bart-large-cnn"), _load_seq2seq("facebook/bart-large-cnn"))
+MODELS.register("classifier", ("text-classification", "roberta-large-mnli"),
+                _load_pipeline("text-classification", "roberta-large-mnli", tokenizer="roberta-large-mnli"))
+# Both generators are the same GPT-2 pipeline
+MODELS.register("address_generator", ("text-generation", "GPT2"), _load_pipeline("text-generation", "GPT2"))
+MODELS.register("domain_generator", ("text-generation", "GPT2"), _load_pipeline("text-generation", "GPT2"))
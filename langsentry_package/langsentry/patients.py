@@ -0,0 +1,84 @@
+from array import array
+
+# Substrings up to this length get a postings list
+GRAM_SIZE = 3
+
+
+class PatientMapping(dict):
+    """
+    Normalised patient name or email local part -> (fake name, fake email), as built by
+    build_patient_mapping, with an index for find().
+
+    find(candidate) returns the first entry, in insertion order, whose key contains the
+    candidate or is contained in it, like a scan over items() would, without walking
+    the whole mapping:
+      - keys contained in the candidate are looked up directly, for every substring of
+        the candidate up to the longest key;
+      - keys containing the candidate come from the postings of the substrings of up to
+        GRAM_SIZE characters. A longer candidate is checked against the keys in the
+        shortest postings list of its GRAM_SIZE-character substrings.
+
+    add() appends entries, other changes to the mapping are not indexed.
+    """
+
+    def __init__(self, entries=()):
+        super().__init__(entries)
+        self._keys = []
+        self._positions = {}
+        self._longest = 0
+        self._postings = {}  # substring -> positions of the keys containing it, ascending
+        for key in self:
+            self._index(key)
+
+    def add(self, key, value):
+        """Sets key to value, a new key comes last in the order find() goes by."""
+        if key not in self:
+            self._index(key)
+        self[key] = value
+
+    def _index(self, key):
+        position = len(self._keys)
+        self._keys.append(key)
+        self._positions[key] = position
+        self._longest = max(self._longest, len(key))
+        grams = {key[i:i + n] for n in range(1, GRAM_SIZE + 1) for i in range(len(key) - n + 1)}
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("i")
+            postings.append(position)
+
+    def find(self, candidate):
+        """The (key, value) of the first entry matching candidate, or None."""
+        best = self._containing(candidate)
+        positions = self._positions
+        for start in range(len(candidate) + 1):
+            for end in range(start, min(len(candidate), start + self._longest) + 1):
+                position = positions.get(candidate[start:end])
+                if position is not None and (best is None or position < best):
+                    best = position
+        if best is None:
+            return None
+        key = self._keys[best]
+        return key, self[key]
+
+    def _containing(self, candidate):
+        # Position of the first key that contains candidate
+        if not self._keys:
+            return None
+        if not candidate:
+            return 0
+        if len(candidate) <= GRAM_SIZE:
+            postings = self._postings.get(candidate)
+            return postings[0] if postings else None
+
+        lists = []
+        for i in range(len(candidate) - GRAM_SIZE + 1):
+            postings = self._postings.get(candidate[i:i + GRAM_SIZE])
+            if postings is None:
+                return None
+            lists.append(postings)
+        for position in min(lists, key=len):
+            if candidate in self._keys[position]:
+                return position
+        return None
@@ -0,0 +1,257 @@
+import re
+
+# The first-character gates read the parse tree of the private re._parser module (sre_parse
+# before Python 3.11). If those internals change or go away, _first_chars returns None and
+# the patterns are matched as a plain ungated alternation: slower, but the same matches.
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    try:
+        import sre_parse
+    except ImportError:
+        sre_parse = None
+
+from .cache import LRUCache
+
+# A leading global flag group such as (?i), only allowed at the start of a whole regex
+LEADING_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+# Backreferences and conditionals refer to group numbers, which change in the alternation
+GROUP_REFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+# Character classes of the \d, \s and \w categories
+CATEGORY_CLASSES = {
+    "CATEGORY_DIGIT": r"\d", "CATEGORY_NOT_DIGIT": r"\D",
+    "CATEGORY_SPACE": r"\s", "CATEGORY_NOT_SPACE": r"\S",
+    "CATEGORY_WORD": r"\w", "CATEGORY_NOT_WORD": r"\W",
+}
+
+# Compiled matchers per sensitive_patterns, shared by every config with the same regexes
+MATCHERS = LRUCache(maxsize=256)
+
+
+def _scoped(regex):
+    # '(?i)abc' -> '(?i:abc)' so the regex can sit inside the alternation
+    flags = LEADING_FLAGS.match(regex)
+    if flags is None:
+        return f"(?:{regex})"
+    body = regex[flags.end():]
+    # A verbose regex may end in a comment, the closing parenthesis goes on a new line
+    end = "\n)" if "x" in flags.group(1) else ")"
+    return f"(?{flags.group(1)}:{body}{end}"
+
+
+class _Unknown(Exception):
+    pass
+
+
+def _add_first_chars(sequence, items):
+    # Adds the character class items a match of the parsed sequence can start with.
+    # Returns True when the sequence can match the empty string.
+    for op, av in sequence:
+        op = str(op)
+        if op == "LITERAL":
+            items.add(re.escape(chr(av)))
+            return False
+        if op == "IN":
+            for item_op, item_av in av:
+                item_op = str(item_op)
+                if item_op == "LITERAL":
+                    items.add(re.escape(chr(item_av)))
+                elif item_op == "RANGE":
+                    items.add(f"{re.escape(chr(item_av[0]))}-{re.escape(chr(item_av[1]))}")
+                elif item_op == "CATEGORY" and str(item_av) in CATEGORY_CLASSES:
+                    items.add(CATEGORY_CLASSES[str(item_av)])
+                else:
+                    raise _Unknown
+            return False
+        if op in ("AT", "ASSERT", "ASSERT_NOT"):
+            continue  # zero-width
+        if op == "SUBPATTERN":
+            if av[1] or av[2]:
+                raise _Unknown  # scoped flags
+            if not _add_first_chars(av[3], items):
+                return False
+        elif op == "ATOMIC_GROUP":
+            if not _add_first_chars(av, items):
+                return False
+        elif op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            if not _add_first_chars(av[2], items) and av[0] > 0:
+                return False
+        elif op == "BRANCH":
+            nullable = [_add_first_chars(branch, items) for branch in av[1]]
+            if not any(nullable):
+                return False
+        else:
+            raise _Unknown
+    return True
+
+
+def _first_chars(regex):
+    # (character class body, ignore case) of the characters every match of regex starts
+    # with, e.g. ('\\d', False) for r'\b\d{3}-\d{4}'. None when that cannot be worked out
+    # or the regex can match the empty string.
+    if sre_parse is None:
+        return None
+    try:
+        parsed = sre_parse.parse(regex)
+        items = set()
+        if _add_first_chars(parsed.data, items):
+            return None
+    except (re.error, _Unknown, AttributeError, TypeError, ValueError):
+        return None
+    return "".join(sorted(items)), bool(parsed.state.flags & re.IGNORECASE)
+
+
+def _gate(first_chars):
+    # Lookahead that fails at once where none of the characters can start a match
+    plain = "".join(chars for chars, ignorecase in first_chars if not ignorecase)
+    folded = "".join(chars for chars, ignorecase in first_chars if ignorecase)
+    classes = ([f"[{plain}]"] if plain else []) + ([f"(?i:[{folded}])"] if folded else [])
+    return f"(?={'|'.join(classes)})"
+
+
+class PatternMatcher:
+    """
+    All sensitive_patterns of a config compiled into one alternation, so one pass over
+    the text finds every label.
+
+    Like the detection rules in sanitize.py, the alternation is gated by the characters
+    a match can start with: regexes with the same first characters share one gated
+    group, and a leading gate over all of them skips positions where no regex can match.
+
+    labels_in() answers which labels match, as re.search per label would. find() returns
+    the matches of those labels as {"label", "span", "text"} dicts ordered by position,
+    as re.finditer per label would. Regexes that cannot share one alternation
+    (backreferences, conditionals) make the matcher fall back to one search per label.
+    """
+
+    def __init__(self, patterns):
+        # patterns: (label, regex) pairs in config order
+        self.labels = [label for label, _ in patterns]
+        self.patterns = [re.compile(regex) for _, regex in patterns]
+        self.combinable = not any(GROUP_REFERENCE.search(pattern.pattern) for pattern in self.patterns)
+
+        # Label indexes grouped by the characters their matches start with, in config order
+        self.groups = {}
+        for index, pattern in enumerate(self.patterns):
+            self.groups.setdefault(_first_chars(pattern.pattern), []).append(index)
+        # Per group, a regex of those characters, used to retry labels at few positions
+        self.rechecks = []
+        for first, indexes in self.groups.items():
+            first_char = re.compile(f"[{first[0]}]", re.IGNORECASE if first[1] else 0) if first else None
+            self.rechecks.append((first_char, indexes))
+
+        self._alternations = LRUCache(maxsize=64)
+        self.combined = self._alternation(frozenset(range(len(self.patterns))))[0]
+
+    def _alternation(self, indexes):
+        # The gated alternation of the given label indexes and its group number -> label index
+        cached = self._alternations.get(indexes)
+        if cached is not None:
+            return cached
+
+        parts = []
+        group_labels = {}
+        group = 1
+        gates = []
+        for first, members in self.groups.items():
+            branches = []
+            for index in members:
+                if index in indexes:
+                    branches.append(f"({_scoped(self.patterns[index].pattern)})")
+                    group_labels[group] = index
+                    group += 1 + self.patterns[index].groups
+            if branches:
+                alternation = "|".join(branches)
+                parts.append(f"{_gate([first])}(?:{alternation})" if first else alternation)
+                gates.append(first)
+
+        combined = None
+        if parts and self.combinable:
+            regex = "|".join(parts)
+            if None not in gates:
+                regex = f"{_gate(gates)}(?:{regex})"
+            try:
+                combined = re.compile(regex)
+            except re.error:
+                combined = None
+        self._alternations.put(indexes, (combined, group_labels))
+        return combined, group_labels
+
+    def _recheck(self, text, found, hidden):
+        # A label can only be missing because its match starts inside the match of
+        # another label (or where another label won), so only those positions are retried,
+        # and of those only the ones with a character the label's matches can start with
+        for first_char, indexes in self.rechecks:
+            missing = [index for index in indexes if index not in found]
+            for start, end in hidden:
+                pos = start
+                while missing and pos < end:
+                    if first_char is not None:
+                        candidate = first_char.search(text, pos, end)
+                        if candidate is None:
+                            break
+                        pos = candidate.start()
+                    for index in list(missing):
+                        match = self.patterns[index].match(text, pos)
+                        if match is not None:
+                            found.add(index)
+                            missing.remove(index)
+                    pos += 1
+
+    def find(self, text, pos=0):
+        """
+        Returns the matched label, (start, end) span and text of every match starting at
+        or after pos, ordered by position and then config order. These are exactly the
+        matches of Pattern.finditer(text, pos) per label: the one-pass search picks the
+        labels present, so only those run finditer. Like Pattern.finditer, word
+        boundaries and lookbehinds still see the text before pos.
+        """
+        matches = sorted((match.start(), index, match.end())
+                         for index in self._found(text)
+                         for match in self.patterns[index].finditer(text, pos))
+        return [{"label": self.labels[index], "span": (start, end), "text": text[start:end]}
+                for start, index, end in matches]
+
+    def labels_in(self, text):
+        """
+        The labels whose regex matches the text, in config order. A label is dropped from
+        the alternation once found, so like one re.search per label the scan gets cheaper
+        as labels are found and stops when all of them are.
+        """
+        found = self._found(text)
+        return [label for index, label in enumerate(self.labels) if index in found]
+
+    def _found(self, text):
+        # Indexes of the labels whose regex matches the text
+        if self.combined is None:
+            return {index for index, pattern in enumerate(self.patterns) if pattern.search(text)}
+
+        remaining = frozenset(range(len(self.patterns)))
+        found = set()
+        hidden = []
+        pos = 0
+        while remaining and pos <= len(text):
+            combined, group_labels = self._alternation(remaining)
+            match = combined.search(text, pos)
+            if match is None:
+                break
+            index = group_labels[match.lastindex]
+            found.add(index)
+            remaining -= {index}
+            start, end = match.span()
+            hidden.append((start, max(end, start + 1)))
+            pos = end
+
+        self._recheck(text, found, hidden)
+        return found
+
+
+def get_matcher(sensitive_patterns):
+    """The PatternMatcher of a config's sensitive_patterns, compiled once and cached."""
+    key = tuple((label, pattern.get("regex", "")) for label, pattern in sensitive_patterns.items())
+    matcher = MATCHERS.get(key)
+    if matcher is None:
+        matcher = PatternMatcher(key)
+        MATCHERS.put(key, matcher)
+    return matcher
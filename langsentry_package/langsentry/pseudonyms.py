@@ -0,0 +1,223 @@
+import json
+import sqlite3
+import threading
+import time
+
+from .cache import LRUCache
+from .patients import PatientMapping
+
+
+class PseudonymStore:
+    """
+    Original value -> pseudonym mappings, e.g. a real person's name -> fake name.
+
+    Entries live in a bounded LRU cache under (tenant, kind, original), so tenants never
+    see each other's pseudonyms and the oldest unused entries are evicted past maxsize.
+    With ttl (seconds) a mapping expires and the next lookup creates a new pseudonym.
+
+    With path, every mapping is also written to a SQLite file. Lookups that miss the
+    cache fall back to it, so pseudonyms stay the same across restarts and across
+    worker processes sharing the file. Values must be JSON serializable; tuples come
+    back as tuples. The file is bounded too: purge() deletes expired rows and the oldest
+    rows past max_rows. It runs whenever the table outgrows max_rows and every
+    PURGE_INTERVAL writes.
+
+    find() looks up the oldest stored original that contains a candidate or is
+    contained in it, as generate_fake_email_from_original matches email local parts.
+    Its index is read from the file on first use, then kept up to date with the
+    mappings this store writes.
+    """
+
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, maxsize=100000, ttl=None, path=None, max_rows=1000000):
+        self.ttl = ttl
+        self.path = path
+        self.max_rows = max_rows
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.RLock()
+        self.db_hits = 0
+        self.created = 0
+        self.purged = 0
+        self._db = None
+        self._rows = 0    # rows in the table, as far as this process knows
+        self._writes = 0
+        self._indexes = {}  # (tenant, kind) -> PatientMapping of the originals, oldest first
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS pseudonyms ("
+                "tenant TEXT, kind TEXT, original TEXT, pseudonym TEXT, created REAL, "
+                "PRIMARY KEY (tenant, kind, original))"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS pseudonyms_created ON pseudonyms (created)")
+            self._rows = self._db.execute("SELECT COUNT(*) FROM pseudonyms").fetchone()[0]
+
+    def get(self, kind, original, tenant="default"):
+        """The pseudonym of original, or None."""
+        key = (tenant, kind, original)
+        value = self._cache.get(key)
+        if value is not None or self._db is None:
+            return value
+        with self._lock:
+            value = self._load(key)
+            if value is not None:
+                self.db_hits += 1
+                self._cache.put(key, value)
+            return value
+
+    def put(self, kind, original, pseudonym, tenant="default"):
+        key = (tenant, kind, original)
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO pseudonyms VALUES (?, ?, ?, ?, ?)",
+                                 (*key, json.dumps(pseudonym), time.time()))
+                self._written(1)
+            self._cache.put(key, pseudonym)
+            self._indexed(key)
+
+    def get_or_create(self, kind, original, factory, tenant="default"):
+        """
+        The pseudonym of original, made with factory() the first time. Threads and
+        processes sharing the SQLite file that race on the same original all get the
+        pseudonym that was stored first.
+        """
+        key = (tenant, kind, original)
+        with self._lock:
+            value = self.get(kind, original, tenant)
+            if value is not None:
+                return value
+            value = factory()
+            self.created += 1
+            if self._db is not None:
+                self._db.execute("DELETE FROM pseudonyms WHERE tenant = ? AND kind = ? AND original = ? AND created <= ?",
+                                 (*key, self._expired_before()))
+                inserted = self._db.execute("INSERT OR IGNORE INTO pseudonyms VALUES (?, ?, ?, ?, ?)",
+                                            (*key, json.dumps(value), time.time())).rowcount
+                value = self._load(key)
+                self._written(inserted)
+            self._cache.put(key, value)
+            self._indexed(key)
+            return value
+
+    def find(self, kind, candidate, tenant="default"):
+        """
+        (original, pseudonym) of the oldest mapping of kind whose original contains
+        candidate or is contained in it, or None.
+        """
+        with self._lock:
+            index = self._index(tenant, kind)
+            for _ in range(2):
+                match = index.find(candidate)
+                if match is None:
+                    return None
+                value = self.get(kind, match[0], tenant)
+                if value is not None:
+                    return match[0], value
+                # Evicted or expired since it was indexed
+                index = self._reindex(tenant, kind)
+            return None
+
+    def _index(self, tenant, kind):
+        index = self._indexes.get((tenant, kind))
+        if index is None:
+            originals = ()
+            if self._db is not None:
+                originals = [row[0] for row in self._db.execute(
+                    "SELECT original FROM pseudonyms WHERE tenant = ? AND kind = ? AND created > ? ORDER BY created",
+                    (tenant, kind, self._expired_before()))]
+            index = self._indexes[(tenant, kind)] = PatientMapping(dict.fromkeys(originals))
+        return index
+
+    def _indexed(self, key):
+        tenant, kind, original = key
+        index = self._index(tenant, kind)
+        index.add(original, None)
+        # Originals evicted from the cache and the file stay indexed until the next reindex
+        if len(index) > 2 * (self.max_rows if self._db is not None else self._cache.maxsize):
+            self._reindex(tenant, kind)
+
+    def _reindex(self, tenant, kind):
+        index = self._indexes[(tenant, kind)] = PatientMapping(
+            (original, None) for original in self._index(tenant, kind) if self._stored((tenant, kind, original)))
+        return index
+
+    def _stored(self, key):
+        return key in self._cache or (self._db is not None and self._load(key) is not None)
+
+    def _written(self, rows):
+        self._rows += rows
+        self._writes += 1
+        if self._rows > self.max_rows or self._writes % self.PURGE_INTERVAL == 0:
+            self.purge()
+
+    def purge(self):
+        """Deletes the expired rows and the oldest rows past max_rows, returns how many."""
+        if self._db is None:
+            return 0
+        with self._lock:
+            deleted = 0
+            if self.ttl is not None:
+                deleted += self._db.execute("DELETE FROM pseudonyms WHERE created <= ?",
+                                            (self._expired_before(),)).rowcount
+            # Other processes write to the same file, so the count is read again here
+            excess = self._db.execute("SELECT COUNT(*) FROM pseudonyms").fetchone()[0] - self.max_rows
+            if excess > 0:
+                deleted += self._db.execute(
+                    "DELETE FROM pseudonyms WHERE rowid IN "
+                    "(SELECT rowid FROM pseudonyms ORDER BY created LIMIT ?)", (excess,)).rowcount
+            self._rows = self._db.execute("SELECT COUNT(*) FROM pseudonyms").fetchone()[0]
+            self.purged += deleted
+            return deleted
+
+    def _expired_before(self):
+        return time.time() - self.ttl if self.ttl is not None else float("-inf")
+
+    def _load(self, key):
+        row = self._db.execute(
+            "SELECT pseudonym FROM pseudonyms WHERE tenant = ? AND kind = ? AND original = ? AND created > ?",
+            (*key, self._expired_before())).fetchone()
+        if row is None:
+            return None
+        value = json.loads(row[0])
+        return tuple(value) if isinstance(value, list) else value
+
+    def clear(self, tenant=None):
+        """Forget every mapping, or only those of one tenant."""
+        with self._lock:
+            if tenant is None:
+                self._cache.clear()
+                self._indexes.clear()
+                if self._db is not None:
+                    self._db.execute("DELETE FROM pseudonyms")
+                    self._rows = 0
+            else:
+                self._cache.remove(lambda key: key[0] == tenant)
+                for key in [key for key in self._indexes if key[0] == tenant]:
+                    del self._indexes[key]
+                if self._db is not None:
+                    self._rows -= self._db.execute("DELETE FROM pseudonyms WHERE tenant = ?", (tenant,)).rowcount
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats["db_hits"] = self.db_hits
+        stats["created"] = self.created
+        stats["purged"] = self.purged
+        if self._db is not None:
+            with self._lock:
+                stats["db_size"] = self._db.execute("SELECT COUNT(*) FROM pseudonyms").fetchone()[0]
+        return stats
+
+    def close(self):
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+                self._db = None
+
+
+# Shared by every config without a "pseudonym_store" of its own
+PSEUDONYMS = PseudonymStore()
@@ -0,0 +1,148 @@
+import queue
+import re
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future
+
+from .models import MODELS, _load_pipeline
+
+DEFAULT_SAFETY_MODEL = "roberta-large-mnli"
+
+# Zero-shot candidate label -> label reported by the classifier
+DEFAULT_SAFETY_LABELS = {
+    "dangerous, harmful or illegal instructions": "DANGEROUS",
+    "safe and harmless content": "SAFE",
+}
+
+# Word prefixes that can make a response worth classifying. Text without any of them
+# is treated as benign and never reaches the model.
+DANGER_TERMS = [
+    "attack", "bomb", "bypass", "credential", "detonat", "drug", "exploit", "explosive",
+    "firearm", "gun", "hack", "harm", "kill", "malware", "meth", "murder", "overdose",
+    "password", "phish", "poison", "ransomware", "steal", "suicide", "weapon",
+]
+
+
+class SafetyClassifier:
+    """
+    Zero-shot MNLI safety check of a response, in three stages:
+
+    1. gate: a regex over gate_terms. Text that contains none of them is benign and
+       skips inference (gate_terms=None classifies everything).
+    2. queue: texts that pass the gate wait up to max_wait seconds in a shared queue, so
+       one worker thread runs a single batched pipeline call for concurrent requests.
+    3. inference: the candidate labels of `labels` are scored and the scores summed per
+       mapped label. The text is dangerous when the top label is in dangerous_labels
+       with at least `threshold`.
+
+    classify() returns {"dangerous", "label", "score", "timings"}, with the seconds spent
+    per stage in timings. Texts that went through the model also carry "batch_size".
+    """
+
+    def __init__(self, model=DEFAULT_SAFETY_MODEL, labels=None, dangerous_labels=("DANGEROUS",),
+                 threshold=0.5, gate_terms=DANGER_TERMS, hypothesis_template="This text contains {}.",
+                 batch_size=16, max_wait=0.005):
+        self.model = model
+        self.labels = dict(DEFAULT_SAFETY_LABELS if labels is None else labels)
+        self.dangerous_labels = set(dangerous_labels)
+        self.threshold = threshold
+        self.hypothesis_template = hypothesis_template
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.gate = None
+        if gate_terms:
+            self.gate = re.compile(r"\b(?:" + "|".join(map(re.escape, gate_terms)) + ")", re.IGNORECASE)
+
+        # Pipelines for the same model are shared through the registry
+        self.model_name = f"safety:{model}"
+        MODELS.register(self.model_name, ("zero-shot-classification", model),
+                        _load_pipeline("zero-shot-classification", model))
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def passes_gate(self, text):
+        return self.gate is None or self.gate.search(text) is not None
+
+    def classify(self, text):
+        return self.classify_many([text])[0]
+
+    def classify_many(self, texts):
+        """classify() for several texts, the ones past the gate are queued together."""
+        results = []
+        pending = []
+        for text in texts:
+            start = time.perf_counter()
+            passed = self.passes_gate(text)
+            gate = time.perf_counter() - start
+            if passed:
+                pending.append((len(results), gate, self._submit(text)))
+                results.append(None)
+            else:
+                results.append({"dangerous": False, "label": None, "score": None, "timings": {"gate": gate}})
+        for index, gate, future in pending:
+            result = future.result()
+            result["timings"] = {"gate": gate, **result["timings"]}
+            results[index] = result
+        return results
+
+    def _submit(self, text):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="langsentry-safety", daemon=True)
+                    self._worker.start()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._classify_batch(batch)
+
+    def _classify_batch(self, batch):
+        # Any error, in the pipeline or in reading its outputs, goes to the futures still
+        # waiting, so callers never hang and the worker keeps running
+        try:
+            start = time.perf_counter()
+            outputs = MODELS.get(self.model_name)(
+                [text for text, _, _ in batch],
+                candidate_labels=list(self.labels),
+                hypothesis_template=self.hypothesis_template,
+                batch_size=len(batch),
+            )
+            inference = time.perf_counter() - start
+            if isinstance(outputs, dict):
+                outputs = [outputs]
+            if len(outputs) != len(batch):
+                raise ValueError(f"expected {len(batch)} classifier outputs, got {len(outputs)}")
+
+            for (_, future, submitted), output in zip(batch, outputs):
+                scores = defaultdict(float)
+                for candidate, score in zip(output["labels"], output["scores"]):
+                    scores[self.labels[candidate]] += score
+                label = max(scores, key=scores.get)
+                future.set_result({
+                    "dangerous": label in self.dangerous_labels and scores[label] >= self.threshold,
+                    "label": label,
+                    "score": scores[label],
+                    "batch_size": len(batch),
+                    "timings": {"queue": start - submitted, "inference": inference},
+                })
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+SAFETY = SafetyClassifier()
@@ -2,6 +2,10 @@ import unicodedata
 import re
 import html
 import shlex
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
 # Unicode zero-width and tag characters
 ZERO_WIDTH_CHARS = {
@@ -13,69 +17,196 @@ ZERO_WIDTH_CHARS = {
 
 TAG_CHARACTER_OFFSET = 0xE0000  # Unicode tag characters start at U+E0000
 
+ZERO_WIDTH_PATTERN = re.compile('[\u200B\u200C\u200D\uFEFF]')
+NOT_ZERO_WIDTH_PATTERN = re.compile('[^\u200B\u200C\u200D\uFEFF]+')
+TAG_PATTERN = re.compile('[\U000E0000-\U000E007F]')
+NOT_TAG_PATTERN = re.compile('[^\U000E0000-\U000E007F]+')
+ZERO_WIDTH_BITS = str.maketrans(ZERO_WIDTH_CHARS)
+TAG_DECODE = {TAG_CHARACTER_OFFSET + i: i for i in range(0x80)}
+
+# Work limits of sanitize_input(bounded=True)
+SCAN_LIMIT = 65536        # characters scanned in full from the start of the input
+SAMPLE_WINDOWS = 16       # windows sampled evenly from the rest of the input
+SAMPLE_SIZE = 1024        # characters per sampled window
+MAX_HIDDEN_CHARS = 1024   # characters decoded from a hidden message
+
+
+# Categories in the order detect_context reports them when several match
+CATEGORY_PRIORITY = ("invisible_unicode", "html/javascript", "sql", "shell")
+
+# Detection rules per category: (regex group name, characters a match can start with,
+# characters it can start with in any case, regex). The second set is matched
+# case-insensitively like the (?i:...) rules, so case-fold equivalents such as 'ſ' (U+017F)
+# for 's' or 'ı' (U+0131) for 'i' still pass the gate.
+DETECTION_RULES = {
+    "invisible_unicode": ("invisible_unicode", "\u200B\u200C\u200D\uFEFF\U000E0000-\U000E007F", "",
+                          r"[\u200B\u200C\u200D\uFEFF\U000E0000-\U000E007F]+"),
+    "html/javascript": ("html", "<", "oj", r"(?i:<script|onerror=|<iframe|javascript:)"),
+    "sql": ("sql", r"\-;", "sidua",
+            r"(?i:\b(?:SELECT|INSERT|DELETE|UPDATE|DROP|--|;|\bUNION\b|\bOR\b|\bAND\b))"),
+    "shell": ("shell", r"$`;&|><", "rcwes", r"[\$`;&|><]|(?i:\b(?:rm|chmod|chown|wget|curl|eval|exec|system)\b)"),
+}
+GROUP_CATEGORIES = {group: category for category, (group, _, _, _) in DETECTION_RULES.items()}
+
+
+def _compile_rules(categories):
+    # One alternation over the rules of the given categories, in priority order. The leading
+    # lookahead lists every character a rule can start with, so most positions fail that one
+    # check instead of trying each alternative.
+    if not categories:
+        return None
+    plain = "".join(DETECTION_RULES[category][1] for category in categories)
+    folded = "".join(DETECTION_RULES[category][2] for category in categories)
+    gate = "|".join(([f"[{plain}]"] if plain else []) + ([f"(?i:[{folded}])"] if folded else []))
+    branches = "|".join(f"(?P<{DETECTION_RULES[category][0]}>{DETECTION_RULES[category][3]})"
+                        for category in categories)
+    return re.compile(f"(?={gate})(?:{branches})")
+
+
+# All detection rules as one alternation, so a single finditer pass classifies the input
+DETECTION_PATTERN = _compile_rules(CATEGORY_PRIORITY)
+# For every category, the rules of the categories that outrank it
+OUTRANKING_PATTERNS = {category: _compile_rules(CATEGORY_PRIORITY[:i])
+                       for i, category in enumerate(CATEGORY_PRIORITY)}
+WORD_END = re.compile(r"\W")
+SHELL_CHARS = frozenset("$`;&|><")
+
+
+def _iter_categories(user_input: str):
+    # Yields (category, start, end) for every rule match in one pass
+    for match in DETECTION_PATTERN.finditer(user_input):
+        category = GROUP_CATEGORIES[match.lastgroup]
+        start = match.start()
+        yield category, start, match.end()
+        # '<script', '<iframe' and ';' are shell metacharacters as well, the
+        # alternation can only report one category for them
+        if category != "shell" and user_input[start] in SHELL_CHARS:
+            yield "shell", start, start + 1
+
+
+def detect_categories(user_input: str) -> dict:
+    """
+    Classifies the input in one linear pass over the precompiled detection rules.
+    Returns a dict mapping every matched category to the list of (start, end) spans
+    where it matched, in CATEGORY_PRIORITY order. An empty dict means non-malicious.
+    """
+    spans = {}
+    for category, start, end in _iter_categories(user_input):
+        spans.setdefault(category, []).append((start, end))
+
+    return {category: spans[category] for category in CATEGORY_PRIORITY if category in spans}
+
+
+def _best_category(user_input: str, pos: int = 0, endpos: int = None):
+    # The leftmost match decides the first candidate. After that only the rules of
+    # categories that outrank it are searched, so there are at most four searches.
+    endpos = len(user_input) if endpos is None else endpos
+    best = None
+    pattern = DETECTION_PATTERN
+    while pattern is not None:
+        match = pattern.search(user_input, pos, endpos)
+        if match is None:
+            break
+        best = GROUP_CATEGORIES[match.lastgroup]
+        pattern = OUTRANKING_PATTERNS[best]
+        pos = match.start() + 1
+    return best
+
 
 def detect_context(user_input: str) -> str:
     """
     Automatically detects the context of an input based on its contents.
     Returns one of: 'html/javascript', 'sql', 'shell', 'non-malicious', or 'invisible_unicode'.
     """
+    return _best_category(user_input) or "non-malicious"
 
-    # Detect Invisible Unicode Encoding (Zero-width or Tag Characters)
-    if any(char in ZERO_WIDTH_CHARS or 0xE0000 <= ord(char) <= 0xE007F for char in user_input):
-        return "invisible_unicode"
 
-    # Detect HTML/XSS attack patterns
-    if re.search(r'(?i)<script|onerror=|<iframe|javascript:', user_input):
-        return "html/javascript"
-
-    # Detect SQL Injection patterns
-    if re.search(r"(?i)\b(SELECT|INSERT|DELETE|UPDATE|DROP|--|;|\bUNION\b|\bOR\b|\bAND\b)", user_input):
-        return "sql"
+def detect_context_bounded(user_input: str, scan_limit: int = SCAN_LIMIT, samples: int = SAMPLE_WINDOWS,
+                           sample_size: int = SAMPLE_SIZE) -> str:
+    """
+    Same as detect_context, but scans at most scan_limit + samples * sample_size characters:
+    the start of the input in full, and evenly spaced windows from the rest, the last one
+    ending at the end of the input.
+    """
+    windows = [(0, scan_limit)]
+    rest = len(user_input) - scan_limit
+    if 0 < rest <= samples * sample_size:
+        windows.append((scan_limit, len(user_input)))
+    elif rest > 0 and samples > 0:
+        span = rest - sample_size
+        for i in range(samples):
+            offset = scan_limit + span * i // max(samples - 1, 1)
+            windows.append((offset, offset + sample_size))
 
-    # Detect Shell Injection patterns
-    if re.search(r'[\$`;&|><]', user_input) or re.search(r'(?i)\b(rm|chmod|chown|wget|curl|eval|exec|system)\b', user_input):
-        return "shell"
+    found = set()
+    for start, end in windows:
+        # Searching the full string within (start, end) keeps word boundaries at the
+        # window start exact. The end is moved past the current word for the same reason.
+        word_end = WORD_END.search(user_input, end, end + 64)
+        category = _best_category(user_input, start, word_end.start() if word_end else end + 64)
+        if category == CATEGORY_PRIORITY[0]:
+            return category
+        found.add(category)
 
-    return "non-malicious"
+    return next((category for category in CATEGORY_PRIORITY if category in found), "non-malicious")
 
 
-def detect_and_decode_invisible_unicode(user_input: str) -> str:
+def detect_and_decode_invisible_unicode(user_input: str, max_chars: int = None) -> str:
     """
     Detects and decodes hidden Unicode characters encoded using Zero-width or Tag Unicode encoding.
     Returns the decoded hidden message if found, otherwise an empty string.
+    With max_chars, at most that many characters of the hidden message are decoded.
     """
 
     # Detect and decode zero-width Unicode encoding
-    if any(char in ZERO_WIDTH_CHARS for char in user_input):
-        binary_string = ''.join(ZERO_WIDTH_CHARS.get(char, '')
-                                for char in user_input)
-        decoded_chars = [chr(int(binary_string[i:i+8], 2))
-                         for i in range(0, len(binary_string), 8)]
-        return ''.join(decoded_chars)
+    if ZERO_WIDTH_PATTERN.search(user_input):
+        binary_string = NOT_ZERO_WIDTH_PATTERN.sub('', user_input).translate(ZERO_WIDTH_BITS)
+        if max_chars is not None:
+            binary_string = binary_string[:max_chars * 8]
+        return ''.join(chr(int(binary_string[i:i+8], 2))
+                       for i in range(0, len(binary_string), 8))
 
     # Detect and decode Unicode tag characters
-    elif any(0xE0000 <= ord(char) <= 0xE007F for char in user_input):
-        decoded_text = ''.join(chr(ord(char) - TAG_CHARACTER_OFFSET)
-                               for char in user_input if 0xE0000 <= ord(char) <= 0xE007F)
-        return decoded_text
+    if TAG_PATTERN.search(user_input):
+        tag_chars = NOT_TAG_PATTERN.sub('', user_input)
+        if max_chars is not None:
+            tag_chars = tag_chars[:max_chars]
+        return tag_chars.translate(TAG_DECODE)
 
     return ""  # No hidden message found
 
 
-def sanitize_input(user_input: str, max_length: int = 256) -> dict:
+def sanitize_input(user_input: str, max_length: int = 256, bounded: bool = False) -> dict:
     """
     Detects input context, applies the appropriate sanitization, and returns a dictionary with:
     - category: The detected category (html, sql, shell, non-malicious, invisible_unicode)
     - sanitized_output: The sanitized (or original) input string.
     - decoded_hidden_message: If applicable, the decoded text.
     - decoded_category: Category of the decoded hidden text (if any).
+
+    With bounded=True the cost no longer grows with the input size: detection scans the
+    first SCAN_LIMIT characters plus SAMPLE_WINDOWS sampled windows, and at most
+    MAX_HIDDEN_CHARS hidden characters are decoded from the first SCAN_LIMIT characters.
     """
 
     # Detect context automatically
-    context = detect_context(user_input)
+    if bounded:
+        context = detect_context_bounded(user_input)
+        hidden_source = user_input[:SCAN_LIMIT]
+    else:
+        context = detect_context(user_input)
+        hidden_source = None
 
     # Enforce a strict length limit early
-    user_input = user_input[:max_length]
+    return _sanitize(user_input[:max_length], context, hidden_source,
+                     MAX_HIDDEN_CHARS if bounded else None)
+
+
+def _sanitize(user_input: str, context: str, hidden_source: str = None, max_hidden_chars: int = None) -> dict:
+    # Applies the sanitization of an already detected context to the truncated input.
+    # The hidden message is decoded from hidden_source, the truncated input by default.
+    if hidden_source is None:
+        hidden_source = user_input
 
     # Normalize Unicode to prevent homoglyph attacks
     sanitized = unicodedata.normalize('NFKC', user_input)
@@ -99,7 +230,7 @@ def sanitize_input(user_input: str, max_length: int = 256) -> dict:
     decoded_category = None
     if context == "invisible_unicode":
         decoded_hidden_message = detect_and_decode_invisible_unicode(
-            user_input)
+            hidden_source, max_chars=max_hidden_chars)
         if decoded_hidden_message:
             # Run the decoded message through the detection system again
             decoded_category = detect_context(decoded_hidden_message)
@@ -112,6 +243,140 @@ def sanitize_input(user_input: str, max_length: int = 256) -> dict:
     }
 
 
+def _sanitize_chunk(user_inputs, max_length, bounded):
+    return [sanitize_input(user_input, max_length, bounded) for user_input in user_inputs]
+
+
+def sanitize_many(user_inputs, workers: int = None, chunksize: int = 512, max_length: int = 256,
+                  bounded: bool = False, max_pending: int = None):
+    """
+    Runs sanitize_input over an iterable of inputs in chunks on a process pool and
+    yields the result dicts in input order.
+    - workers: number of processes, defaults to the CPU count. 1 runs in this process.
+    - chunksize: inputs sent to a worker per task.
+    - max_pending: tasks in flight at once, defaults to 2 * workers. The input is only
+      read as fast as results are consumed, so memory stays bounded for any input size.
+    """
+    workers = workers or os.cpu_count() or 1
+    iterator = iter(user_inputs)
+    chunks = iter(lambda: list(islice(iterator, chunksize)), [])
+
+    if workers <= 1:
+        for chunk in chunks:
+            yield from _sanitize_chunk(chunk, max_length, bounded)
+        return
+
+    max_pending = max_pending or 2 * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_sanitize_chunk, chunk, max_length, bounded))
+            # Backpressure: wait for the oldest task before reading more input
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+class StreamingSanitizer:
+    """
+    Incremental sanitize_input for input that arrives in chunks (voice transcription,
+    websocket typing). feed() scans each chunk with the detect_context rules and returns
+    the categories first found in it, so a malicious input can be rejected before it has
+    fully arrived. close() returns the same dict sanitize_input returns for the whole input.
+
+        stream = StreamingSanitizer()
+        for chunk in chunks:
+            if stream.feed(chunk):
+                ...  # stream.category is already known, reject early
+        result = stream.close()
+
+    Of the text itself only the first max_length and the last TAIL_SIZE characters are kept.
+    """
+
+    # Characters carried over to the next chunk. A match starting in the last TAIL_SIZE - 1
+    # characters can still change ('<' before 'script', 'or' before 'der'): the longest rule
+    # is 'javascript:', plus the character after a word rule. The first carried character
+    # is left context for word boundaries.
+    TAIL_SIZE = 12
+
+    def __init__(self, max_length: int = 256):
+        self.max_length = max_length
+        self.length = 0         # characters fed so far
+        self.spans = {}         # category -> list of [start, end] positions in the stream
+        self.closed = False
+        self._head = []         # the first max_length characters, sanitized at close()
+        self._head_length = 0
+        self._tail = ""
+        self._resume = 0        # first match start not decided yet
+        self._consumed = 0      # end of the last recorded match
+
+    @property
+    def categories(self) -> list:
+        """Categories found so far, in CATEGORY_PRIORITY order."""
+        return [category for category in CATEGORY_PRIORITY if category in self.spans]
+
+    @property
+    def category(self) -> str:
+        """What detect_context returns for the input fed so far."""
+        return next(iter(self.categories), "non-malicious")
+
+    def feed(self, chunk: str) -> list:
+        """Adds a chunk and returns the categories first found with it."""
+        if self.closed:
+            raise ValueError("StreamingSanitizer is closed")
+
+        found = self._scan(chunk, final=False)
+        if self._head_length < self.max_length:
+            head = chunk[:self.max_length - self._head_length]
+            self._head.append(head)
+            self._head_length += len(head)
+        self.length += len(chunk)
+        return found
+
+    def close(self) -> dict:
+        """Ends the stream and returns the sanitize_input result of the whole input."""
+        if not self.closed:
+            self._scan("", final=True)
+            self.closed = True
+        return _sanitize("".join(self._head), self.category)
+
+    def _scan(self, chunk, final):
+        buffer = self._tail + chunk
+        offset = self.length - len(self._tail)
+        # Like finditer on the whole input, the scan never restarts inside a recorded match
+        pos = max(self._resume, self._consumed) - offset
+        limit = len(buffer) if final else len(buffer) - self.TAIL_SIZE
+        found = []
+
+        for match in DETECTION_PATTERN.finditer(buffer, pos):
+            start, end = match.span()
+            category = GROUP_CATEGORIES[match.lastgroup]
+            if start > limit and category != "invisible_unicode":
+                # Not decided yet, scanned again with the next chunk. A single invisible
+                # character is decided, a run of them is extended in _record.
+                break
+            self._consumed = offset + end
+            self._record(category, offset + start, offset + end, found)
+            if category != "shell" and buffer[start] in SHELL_CHARS:
+                self._record("shell", offset + start, offset + start + 1, found)
+
+        self._resume = offset + max(limit + 1, 0)
+        self._tail = buffer[-self.TAIL_SIZE:]
+        return found
+
+    def _record(self, category, start, end, found):
+        spans = self.spans.get(category)
+        if spans is None:
+            self.spans[category] = [[start, end]]
+            found.append(category)
+        elif category == "invisible_unicode" and spans[-1][1] == start:
+            # A run of invisible characters continued in the next chunk
+            spans[-1][1] = end
+        else:
+            spans.append([start, end])
+
+
 # Example Usage
 if __name__ == "__main__":
     test_inputs = [
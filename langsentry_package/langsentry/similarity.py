@@ -1,40 +1,122 @@
-import pandas as pd
-from sentence_transformers import SentenceTransformer, util
 import numpy as np
+import hashlib
+import json
+import itertools
 import re
+import weakref
+
+from langsentry.ann import load_index
+from langsentry.cache import LRUCache
+from langsentry.encoders import load_encoder
+from langsentry.store import EMBEDDINGS_PATH, open_embeddings, save_array, score_matrix
+
+# One hash per cleaned sentence, in the same order as the rows of embeddings.npy
+MANIFEST_PATH = "embeddings.manifest.json"
+
+# ANN index loaded by initialize() when one is saved next to embeddings.npy
+INDEX = None
+
+# Words typical of prompt injections, used to decide which chunks to score first
+RISK_TERMS = re.compile(r"(?i)\b(ignore|disregard|forget|override|bypass|pretend|roleplay|jailbreak|"
+                        r"instructions?|system prompt|developer mode|act as|reveal|secret|password)\b")
+
+# Embeddings of recently seen prompt chunks, keyed by model identity and chunk text
+CHUNK_CACHE = LRUCache(maxsize=4096)
+# Cache identities of encoders without a cache_name. A counter, unlike id(), is never
+# reused by a later model, and the weak keys do not keep dropped models alive.
+_ENCODER_IDS = weakref.WeakKeyDictionary()
+_NEXT_ENCODER_ID = itertools.count()
+
+
+def normalize_embeddings(embeddings):
+    # Scale every row to unit length so a plain dot product is the cosine similarity
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return embeddings / norms
+
+
+def sentence_hash(sentence):
+    return hashlib.sha1(sentence.encode("utf-8")).hexdigest()
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH, "r") as f:
+            return json.load(f)["hashes"]
+    except (FileNotFoundError, json.JSONDecodeError, KeyError):
+        return None
+
+
+def save_embeddings(embeddings, hashes):
+    # Swapped in atomically, workers may have the old file memory-mapped
+    save_array(EMBEDDINGS_PATH, embeddings)
+    with open(MANIFEST_PATH, "w") as f:
+        json.dump({"hashes": hashes}, f)
 
 
 def create_embeddings(sentences, model):
-    embeddings = model.encode(sentences)
-    np.save("embeddings.npy", embeddings)
+    embeddings = normalize_embeddings(model.encode(sentences))
+    save_embeddings(embeddings, [sentence_hash(sentence) for sentence in sentences])
     print("Database updated...")
     return embeddings
 
 
+def update_embeddings(sentences, model, embeddings, old_hashes):
+    # Reuse the vectors of rows whose text is unchanged, encode only new or
+    # edited rows and drop rows that are no longer in the corpus
+    old_rows = {h: i for i, h in enumerate(old_hashes)}
+    hashes = [sentence_hash(sentence) for sentence in sentences]
+
+    updated = np.empty((len(sentences), embeddings.shape[1]), dtype=np.float32)
+    kept = [(i, old_rows[h]) for i, h in enumerate(hashes) if h in old_rows]
+    if kept:
+        new_idx, old_idx = zip(*kept)
+        updated[list(new_idx)] = embeddings[list(old_idx)]
+
+    missing = [i for i, h in enumerate(hashes) if h not in old_rows]
+    if missing:
+        updated[missing] = normalize_embeddings(model.encode([sentences[i] for i in missing]))
+
+    removed = len(set(old_hashes) - set(hashes))
+    save_embeddings(updated, hashes)
+    print(f"Database updated: {len(missing)} new or changed, {removed} removed...")
+    return updated
+
+
 def clean_sentences():
+    import pandas as pd
     df = pd.read_csv('malicious.csv')
     sentences = [sentence.lower().replace('br', '').replace('<', "").replace(">", "").replace('\\', "").replace('/', "")
                  for sentence in df.prompt]
     return sentences
 
 
-def get_embeddings(sentences, model):
+def get_embeddings(sentences, model, mmap_mode=None):
     print("Checking for updates...")
     try:
-        embeddings = np.load("embeddings.npy")
-        if len(embeddings) == len(sentences):
-            print("No updates found. Proceeding...")
-            return embeddings
-        else:
-            print("Update to database found. Importing...")
-            return create_embeddings(sentences, model)
+        embeddings = np.load(EMBEDDINGS_PATH, mmap_mode=mmap_mode)
     except FileNotFoundError:
         print("No database found. Importing...")
         return create_embeddings(sentences, model)
 
+    old_hashes = load_manifest()
+    if old_hashes is None or len(old_hashes) != len(embeddings):
+        # Without a matching manifest the rows cannot be tied to sentences
+        print("No manifest for database found. Importing...")
+        return create_embeddings(sentences, model)
+
+    if old_hashes == [sentence_hash(sentence) for sentence in sentences]:
+        print("No updates found. Proceeding...")
+        return embeddings
+
+    print("Update to database found. Importing...")
+    return update_embeddings(sentences, model, embeddings, old_hashes)
+
 
 def get_cossim(my_embeddings, embeddings, sentences):
     # Compute cosine similarity between my sentence, and each one in the corpus
+    from sentence_transformers import util
     winners = []
     for my_embedding in my_embeddings:
         cos_sim = util.cos_sim(my_embedding, embeddings)
@@ -47,23 +129,120 @@ def get_cossim(my_embeddings, embeddings, sentences):
     return final_winners
 
 
-def initialize():
-    model = SentenceTransformer('all-MiniLM-L6-v2')
+def get_topk(my_embeddings, embeddings, sentences, k=1, index=None):
+    # Score every chunk against the corpus with a single matrix product and keep
+    # only the k best corpus rows. The corpus rows must already be unit length,
+    # which is how create_embeddings stores them. With an ANN index only the
+    # rows in the probed lists are scored.
+    queries = normalize_embeddings(my_embeddings)
+    if queries.ndim == 1:
+        queries = queries[np.newaxis, :]
+    if len(queries) == 0 or len(embeddings) == 0:
+        return []
+
+    if index is not None:
+        rows = index.candidates(queries)
+        candidates = embeddings[rows]
+    else:
+        rows = None
+        candidates = embeddings
+
+    # Best score of each corpus row over all chunks
+    scores = score_matrix(queries, candidates).max(axis=0)
+
+    k = min(k, len(scores))
+    top = np.argpartition(scores, -k)[-k:]
+    top = top[np.argsort(scores[top])[::-1]]
+    ids = top if rows is None else rows[top]
+    return [(float(scores[i]), int(row), sentences[row]) for i, row in zip(top, ids)]
+
+
+def initialize(storage="float32", backend="torch", onnx_path=None):
+    # storage is one of store.STORAGE_MODES. Anything but float32 memory-maps the
+    # matrix so forked workers share its pages instead of each holding a copy.
+    # backend is one of encoders.BACKENDS, onnx runs an exported model with onnxruntime.
+    global INDEX
+    model = load_encoder(backend, onnx_path=onnx_path)
     sentences = clean_sentences()
-    embeddings = get_embeddings(sentences, model)
+    embeddings = get_embeddings(sentences, model, mmap_mode=None if storage == "float32" else "r")
+    INDEX = load_index(embeddings)
+    if storage != "float32":
+        embeddings = open_embeddings(storage)
     return model, sentences, embeddings
 
 
-def similarity(query, model, sentences, embeddings):
-    if len(query.split(" ")) > 2:
-        parts = re.split(r'[.!?;:\-()\[\]{}]', query)
-        chunks = [part.strip() for part in parts if part.strip()]
-        my_embeddings = model.encode(chunks)
+def split_chunks(query):
+    # Prompts of two words or fewer are not screened
+    if len(query.split(" ")) <= 2:
+        return []
+    parts = re.split(r'[.!?;:\-()\[\]{}]', query)
+    return [part.strip() for part in parts if part.strip()]
 
-        final_winners = get_cossim(my_embeddings, embeddings, sentences)
-        # print(f'\nScore :   {final_winners[0][1]}')
-        # print(f'\nSentence :   {final_winners[0][0]}')
-        if float(final_winners[0][1]) > 0.6:
+
+def normalize_chunk(chunk):
+    # For uncased encoders such as all-MiniLM-L6-v2, which lowercase their input and
+    # ignore repeated whitespace: chunks that differ only in those share one embedding
+    return " ".join(chunk.split()).lower()
+
+
+def encoder_identity(model):
+    """
+    The cache identity of an encoder: its cache_name attribute (set by load_encoder),
+    otherwise a number handed out once per encoder object. None if it cannot be cached.
+    """
+    name = getattr(model, "cache_name", None)
+    if name is not None:
+        return name
+    try:
+        if model not in _ENCODER_IDS:
+            _ENCODER_IDS[model] = f"encoder-{next(_NEXT_ENCODER_ID)}"
+        return _ENCODER_IDS[model]
+    except TypeError:  # not weak-referenceable or not hashable
+        return None
+
+
+def encode_chunks(model, chunks, cache=CHUNK_CACHE):
+    # Encode only the chunks that are not cached, in a single model.encode call
+    identity = encoder_identity(model) if cache is not None else None
+    if identity is None:
+        return normalize_embeddings(model.encode(chunks))
+
+    # Only encoders that declare lowercase_chunks get case and whitespace folded keys
+    normalize = normalize_chunk if getattr(model, "lowercase_chunks", False) else str
+    keys = [(identity, normalize(chunk)) for chunk in chunks]
+    vectors = {}
+    for key in keys:
+        if key not in vectors:
+            vector = cache.get(key)
+            if vector is not None:
+                vectors[key] = vector
+
+    missing = list(dict.fromkeys(key for key in keys if key not in vectors))
+    if missing:
+        encoded = normalize_embeddings(model.encode([text for _, text in missing]))
+        for key, vector in zip(missing, encoded):
+            cache.put(key, vector)
+            vectors[key] = vector
+
+    return np.stack([vectors[key] for key in keys])
+
+
+def _default_index(index, embeddings):
+    if index is None and INDEX is not None and INDEX.n_rows == len(embeddings):
+        return INDEX
+    return index
+
+
+def similarity(query, model, sentences, embeddings, index=None, cache=CHUNK_CACHE):
+    chunks = split_chunks(query)
+    if chunks:
+        my_embeddings = encode_chunks(model, chunks, cache)
+
+        index = _default_index(index, embeddings)
+        best = get_topk(my_embeddings, embeddings, sentences, k=1, index=index)
+        # print(f'\nScore :   {best[0][0]}')
+        # print(f'\nSentence :   {best[0][2]}')
+        if best and best[0][0] > 0.6:
             return True
         else:
             return False
@@ -71,6 +250,107 @@ def similarity(query, model, sentences, embeddings):
         return False
 
 
+def similarity_batch(queries, model, sentences, embeddings, threshold=0.6, index=None, block_size=1024,
+                     cache=CHUNK_CACHE):
+    """
+    Screen many prompts at once. The uncached chunks of all queries go through a single
+    model.encode call and are scored block by block against the corpus.
+    Returns one dict per query with the verdict, best score and best matching sentence.
+    """
+    chunks = []
+    owners = []
+    for i, query in enumerate(queries):
+        for chunk in split_chunks(query):
+            chunks.append(chunk)
+            owners.append(i)
+
+    results = [{"malicious": False, "score": None, "sentence": None} for _ in queries]
+    if not chunks:
+        return results
+
+    my_embeddings = encode_chunks(model, chunks, cache)
+    index = _default_index(index, embeddings)
+
+    # Best corpus row for every chunk
+    best_scores = np.empty(len(chunks), dtype=np.float32)
+    best_rows = np.empty(len(chunks), dtype=np.int64)
+    for start in range(0, len(chunks), block_size):
+        block = my_embeddings[start:start + block_size]
+        if index is not None:
+            rows = index.candidates(block)
+            scores = score_matrix(block, embeddings[rows])
+        else:
+            rows = None
+            scores = score_matrix(block, embeddings)
+        best = scores.argmax(axis=1)
+        best_scores[start:start + block_size] = scores[np.arange(len(block)), best]
+        best_rows[start:start + block_size] = best if rows is None else rows[best]
+
+    # Chunks of a query are contiguous, reduce each run to its best chunk
+    owners = np.asarray(owners)
+    starts = np.flatnonzero(np.r_[True, owners[1:] != owners[:-1]])
+    ends = np.r_[starts[1:], len(owners)]
+    for start, end in zip(starts, ends):
+        best = start + int(np.argmax(best_scores[start:end]))
+        score = float(best_scores[best])
+        results[owners[start]] = {
+            "malicious": score > threshold,
+            "score": score,
+            "sentence": sentences[best_rows[best]],
+        }
+    return results
+
+
+def chunk_risk(chunk):
+    # Cheap ordering key: chunks with more risk terms first, then longer ones
+    return len(RISK_TERMS.findall(chunk)), len(chunk.split())
+
+
+def similarity_match(query, model, sentences, embeddings, threshold=0.6, min_words=2, index=None,
+                     cache=CHUNK_CACHE):
+    """
+    Early-exit screening of a single prompt. Chunks with fewer than min_words words are
+    skipped and the rest are scored riskiest first, starting with a single chunk and
+    doubling the group size after every group without a hit. Scoring stops at the first
+    chunk above threshold.
+
+    Returns a dict with the verdict, the best score, the chunk and corpus row that produced
+    it and how many chunks were scored.
+    """
+    chunks = [chunk for chunk in split_chunks(query) if len(chunk.split()) >= min_words]
+    chunks.sort(key=chunk_risk, reverse=True)
+    index = _default_index(index, embeddings)
+
+    result = {"malicious": False, "score": None, "chunk": None, "sentence": None, "row": None,
+              "chunks_scored": 0}
+    start = 0
+    group_size = 1
+    while start < len(chunks):
+        group = chunks[start:start + group_size]
+        my_embeddings = encode_chunks(model, group, cache)
+        if index is not None:
+            rows = index.candidates(my_embeddings)
+            scores = score_matrix(my_embeddings, embeddings[rows])
+        else:
+            rows = None
+            scores = score_matrix(my_embeddings, embeddings)
+
+        best = scores.argmax(axis=1)
+        for i, chunk in enumerate(group):
+            score = float(scores[i, best[i]])
+            result["chunks_scored"] += 1
+            if result["score"] is None or score > result["score"]:
+                row = int(best[i] if rows is None else rows[best[i]])
+                result.update(score=score, chunk=chunk, sentence=sentences[row], row=row)
+            if score > threshold:
+                result["malicious"] = True
+                return result
+
+        start += group_size
+        group_size *= 2
+    return result
+
+
 def main():
     # load our Sentence Transformers model pre trained!!
     model, sentences, embeddings = initialize()
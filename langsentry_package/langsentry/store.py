@@ -0,0 +1,111 @@
+import os
+
+import numpy as np
+
+EMBEDDINGS_PATH = "embeddings.npy"
+FLOAT16_PATH = "embeddings.f16.npy"
+INT8_PATH = "embeddings.int8.npy"
+INT8_SCALES_PATH = "embeddings.int8.scales.npy"
+
+# float32: load a private copy (default)
+# mmap:    float32 opened read-only with memory mapping, pages are shared between workers
+# float16: memory-mapped half precision copy
+# int8:    memory-mapped int8 codes with one float32 scale per row
+STORAGE_MODES = ("float32", "mmap", "float16", "int8")
+
+
+class QuantizedEmbeddings:
+    """
+    int8 embedding matrix with a per-row scale factor, row ~= codes[row] * scales[row].
+
+    Supports what the similarity code needs from an embedding matrix: len(), shape,
+    row selection with embeddings[rows] and scoring through score_matrix().
+    """
+
+    def __init__(self, codes, scales):
+        self.codes = codes
+        self.scales = scales
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, rows):
+        return QuantizedEmbeddings(self.codes[rows], self.scales[rows])
+
+    @property
+    def shape(self):
+        return self.codes.shape
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+
+def quantize_int8(embeddings):
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    scales = np.abs(embeddings).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(embeddings / scales[:, np.newaxis]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def score_matrix(queries, embeddings, block_size=16384):
+    """
+    Return queries @ embeddings.T as float32 for any storage mode.
+
+    float16 and int8 rows are converted to float32 one block at a time, so the
+    temporary copy never exceeds block_size rows.
+    """
+    if isinstance(embeddings, QuantizedEmbeddings):
+        codes, scales = embeddings.codes, embeddings.scales
+    elif embeddings.dtype == np.float32:
+        return queries @ embeddings.T
+    else:
+        codes, scales = embeddings, None
+
+    scores = np.empty((len(queries), len(codes)), dtype=np.float32)
+    for start in range(0, len(codes), block_size):
+        block = np.asarray(codes[start:start + block_size], dtype=np.float32)
+        scores[:, start:start + block_size] = queries @ block.T
+        if scales is not None:
+            scores[:, start:start + block_size] *= scales[start:start + block_size]
+    return scores
+
+
+def save_array(path, array):
+    # Swap in a complete file so readers never map a half-written one
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def _is_stale(path, source=EMBEDDINGS_PATH):
+    return not os.path.exists(path) or os.path.getmtime(path) < os.path.getmtime(source)
+
+
+def open_embeddings(mode="float32"):
+    """
+    Open embeddings.npy in the given storage mode. Quantized copies are written next
+    to it the first time they are needed and whenever embeddings.npy is newer.
+    """
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage mode '{mode}'. Expected one of {STORAGE_MODES}")
+
+    if mode == "float32":
+        return np.load(EMBEDDINGS_PATH)
+    if mode == "mmap":
+        return np.load(EMBEDDINGS_PATH, mmap_mode="r")
+
+    if mode == "float16":
+        if _is_stale(FLOAT16_PATH):
+            print("Building float16 embeddings...")
+            save_array(FLOAT16_PATH, np.load(EMBEDDINGS_PATH, mmap_mode="r").astype(np.float16))
+        return np.load(FLOAT16_PATH, mmap_mode="r")
+
+    if _is_stale(INT8_PATH) or _is_stale(INT8_SCALES_PATH):
+        print("Building int8 embeddings...")
+        codes, scales = quantize_int8(np.load(EMBEDDINGS_PATH, mmap_mode="r"))
+        save_array(INT8_PATH, codes)
+        save_array(INT8_SCALES_PATH, scales)
+    return QuantizedEmbeddings(np.load(INT8_PATH, mmap_mode="r"), np.load(INT8_SCALES_PATH, mmap_mode="r"))
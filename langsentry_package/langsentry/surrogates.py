@@ -0,0 +1,167 @@
+import argparse
+import json
+import logging
+import os
+import random
+import re
+import threading
+
+from langsentry.models import MODELS
+
+# Pools shipped with the package: a hand-curated list of 50 organisations, 50 places and
+# 60 addresses. generate_pools() grows a pools file with GPT-2 values.
+POOLS_PATH = os.path.join(os.path.dirname(__file__), "surrogates.json")
+
+# kind -> (generator model, prompt, pattern a value must match, max_new_tokens, fallback value)
+SURROGATE_KINDS = {
+    "org": ("domain_generator", "Output a realistic company name: ",
+            r'^[A-Z][A-Za-z0-9]+( [A-Z][A-Za-z0-9]+)?$', 5, "ExampleCorp"),
+    "location": ("domain_generator", "Output a realistic city name: ",
+                 r'^[A-Z][a-z]+$', 5, "Springfield"),
+    "address": ("address_generator", "Output a realistic street address: ",
+                r'^\d+ [A-Z][a-zA-Z ]+$', 10, "123 Main Street"),
+}
+
+
+def generate_valid_output(generator, prompt, pattern, max_new_tokens, default, max_attempts=5, temperature=0.5):
+    for _ in range(max_attempts):
+        result = generator(
+            prompt,
+            max_new_tokens=max_new_tokens,
+            truncation=True,
+            pad_token_id=50256,
+            num_return_sequences=1,
+            do_sample=True,
+            temperature=temperature
+        )[0]['generated_text']
+        text = result[len(prompt):].strip().split("\n")[0]
+        if re.match(pattern, text):
+            return text
+    return default
+
+
+def load_pools(path=POOLS_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {kind: list(values) for kind, values in json.load(f).items()}
+
+
+class SurrogateProvider:
+    """
+    Fake organisations, places and street addresses drawn from pools on disk.
+
+    A value costs a random.choice() instead of sampling GPT-2 until a regex accepts the
+    output. The pools are read on first use. refill() grows them with newly generated
+    values, start_refill() does so periodically from a daemon thread, and save() writes
+    them back. A kind with an empty pool falls back to a fixed value.
+    """
+
+    def __init__(self, path=POOLS_PATH, max_size=5000):
+        self.path = path
+        self.max_size = max_size
+        self._pools = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.refilled = 0  # values added by refill()
+
+    def pools(self):
+        if self._pools is None:
+            with self._lock:
+                if self._pools is None:
+                    self._pools = load_pools(self.path)
+        return self._pools
+
+    def get(self, kind):
+        pool = self.pools().get(kind)
+        if not pool:
+            return SURROGATE_KINDS[kind][4]
+        return random.choice(pool)
+
+    def add(self, kind, values):
+        """Adds the values that match the pattern of kind and are new, returns how many."""
+        pattern = re.compile(SURROGATE_KINDS[kind][2])
+        pools = self.pools()
+        with self._lock:
+            pool = pools.get(kind, [])
+            known = set(pool)
+            new = []
+            for value in values:
+                if pattern.match(value) and value not in known:
+                    known.add(value)
+                    new.append(value)
+            # Readers keep using the old list, the oldest values go first past max_size
+            pools[kind] = (pool + new)[-self.max_size:]
+        self.refilled += len(new)
+        return len(new)
+
+    def refill(self, kind, count=10):
+        """Generates up to count values of kind with the GPT-2 pipeline and adds them to the pool."""
+        model, prompt, pattern, max_new_tokens, _ = SURROGATE_KINDS[kind]
+        generator = MODELS.get(model)
+        values = [generate_valid_output(generator, prompt, pattern, max_new_tokens, default=None)
+                  for _ in range(count)]
+        return self.add(kind, [value for value in values if value])
+
+    def start_refill(self, kinds=None, count=10, interval=300):
+        """Call refill() for every kind every interval seconds from a daemon thread."""
+        kinds = list(SURROGATE_KINDS) if kinds is None else list(kinds)
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                for kind in kinds:
+                    try:
+                        self.refill(kind, count)
+                    except Exception as e:
+                        logging.warning(f"Refilling the '{kind}' surrogate pool failed: {e}")
+
+        thread = threading.Thread(target=run, name="langsentry-surrogate-refill", daemon=True)
+        thread.start()
+        return thread
+
+    def stop_refill(self):
+        self._stop.set()
+
+    def save(self, path=None):
+        path = path or self.path
+        pools = self.pools()
+        with self._lock:
+            data = {kind: list(values) for kind, values in pools.items()}
+        # Swap in a complete file so readers never load a half-written one
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+            f.write("\n")
+        os.replace(tmp_path, path)
+
+
+SURROGATES = SurrogateProvider()
+
+
+def generate_pools(size, path=POOLS_PATH, max_rounds=50):
+    """Offline step: grows the pools at path to size values per kind and saves them."""
+    provider = SurrogateProvider(path, max_size=max(size, 1))
+    for kind in SURROGATE_KINDS:
+        for _ in range(max_rounds):
+            missing = size - len(provider.pools().get(kind, []))
+            if missing <= 0:
+                break
+            provider.refill(kind, missing)
+    provider.save()
+    return provider
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate the surrogate pools used by segregate_sensitive_info")
+    parser.add_argument("--size", type=int, default=200, help="Values per kind")
+    parser.add_argument("--output", type=str, default=POOLS_PATH, help="Pools file to grow and save")
+    args = parser.parse_args()
+
+    provider = generate_pools(args.size, args.output)
+    for kind, values in provider.pools().items():
+        print(f"{kind}: {len(values)} values")
+
+
+if __name__ == '__main__':
+    main()
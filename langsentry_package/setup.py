@@ -9,6 +9,7 @@ setup(
     name="langsentry",
     version="0.1.0",
     packages=find_packages(),
+    package_data={"langsentry": ["surrogates.json"]},
     install_requires=[
         "spacy",
         "google-genai",
@@ -17,6 +18,9 @@ setup(
         "pandas",
         "numpy",
     ],
+    extras_require={
+        "onnx": ["onnxruntime", "onnx", "transformers", "torch"],
+    },
     author="Edwin, Keith, Max, Tim, Zeph",
     author_email="NIL",
     description="Python-base security module designed to detect and prevent prompt injection attacks in Large Language Model",
@@ -0,0 +1,44 @@
+"""
+analyze_response results keep their shape: timings only go to a dict the caller
+passes, so cached and fresh results of the same text are equal.
+
+    python -m pytest tests/test_analyze_response.py
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.check_output import ResponseCache, analyze_response, load_config  # noqa: E402
+
+spacy = pytest.importorskip("spacy")
+BLANK = spacy.blank("en")
+
+TEXTS = ["Here is a short poem about the sea.", "The ssn is 123-45-6789.", "Call me on account abc1234567890"]
+
+
+def test_no_timings_in_result():
+    config = load_config()
+    for text in TEXTS:
+        assert "timings" not in analyze_response(text, config, BLANK(text))
+
+
+def test_cached_result_equals_fresh():
+    config = load_config()
+    cache = ResponseCache()
+    for text in TEXTS:
+        fresh = analyze_response(text, config, BLANK(text))
+        first, second = {}, {}
+        assert analyze_response(text, config, BLANK(text), cache=cache, timings=first) == fresh
+        assert analyze_response(text, config, BLANK(text), cache=cache, timings=second) == fresh
+        assert set(first) == {"regex", "anomalies", "ner"}
+        assert set(second) == {"cache"}
+
+
+def test_fast_mode_skips_ner():
+    config = dict(load_config(), evaluation_mode="fast")
+    timings = {}
+    result = analyze_response(TEXTS[1], config, BLANK(TEXTS[1]), timings=timings)
+    assert result["verdict"] != "allow"
+    assert set(timings) == {"regex", "anomalies"}
@@ -0,0 +1,78 @@
+"""
+Pooling of the ONNX encoder against hand-computed embeddings, including padded rows.
+
+    python -m pytest tests/test_encoders.py
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.encoders import OnnxEncoder, mean_pool  # noqa: E402
+
+# Two sequences of three tokens, the second one padded after its first token
+HIDDEN = np.array([
+    [[1.0, 2.0, 2.0], [3.0, 0.0, 4.0], [2.0, 4.0, 0.0]],
+    [[3.0, 4.0, 0.0], [100.0, -100.0, 100.0], [100.0, 100.0, 100.0]],
+], dtype=np.float32)
+MASK = np.array([[1, 1, 1], [1, 0, 0]], dtype=np.int64)
+
+# Means (2, 2, 2) and (3, 4, 0), scaled to unit length
+EXPECTED = np.array([
+    [1 / np.sqrt(3), 1 / np.sqrt(3), 1 / np.sqrt(3)],
+    [0.6, 0.8, 0.0],
+], dtype=np.float32)
+
+
+class FakeTokenizer:
+    def __call__(self, sentences, max_length, **kwargs):
+        # One token per word, padded to the longest sentence of the batch
+        lengths = [min(len(sentence.split()), max_length) for sentence in sentences]
+        width = max(lengths)
+        ids = np.array([[1] * n + [0] * (width - n) for n in lengths], dtype=np.int64)
+        return {"input_ids": ids, "attention_mask": (ids > 0).astype(np.int64)}
+
+
+class FakeSession:
+    # Token i of a sentence is (number of words, i + 1, 1); padding is large noise
+    def run(self, outputs, feeds):
+        mask = feeds["attention_mask"]
+        hidden = np.full(mask.shape + (3,), 1000.0, dtype=np.float32)
+        for row, length in enumerate(mask.sum(axis=1)):
+            for i in range(length):
+                hidden[row, i] = (length, i + 1, 1)
+        return [hidden]
+
+
+def fake_encoder(batch_size):
+    encoder = OnnxEncoder.__new__(OnnxEncoder)
+    encoder.session = FakeSession()
+    encoder.input_names = {"input_ids", "attention_mask"}
+    encoder.tokenizer = FakeTokenizer()
+    encoder.max_length = 256
+    encoder.batch_size = batch_size
+    return encoder
+
+
+def expected_embedding(words):
+    mean = np.array([words, (words + 1) / 2, 1.0])
+    return mean / np.linalg.norm(mean)
+
+
+def test_mean_pool_fixture():
+    np.testing.assert_allclose(mean_pool(HIDDEN, MASK), EXPECTED, rtol=1e-6)
+
+
+def test_mean_pool_empty_mask():
+    pooled = mean_pool(np.ones((1, 2, 3), dtype=np.float32), np.zeros((1, 2), dtype=np.int64))
+    assert np.all(np.isfinite(pooled))
+
+
+def test_encode_keeps_input_order():
+    sentences = ["a", "a b c d", "a b", "a b c d e f", "a b c"]
+    expected = np.array([expected_embedding(len(sentence.split())) for sentence in sentences])
+    for batch_size in (1, 2, 32):
+        encoded = fake_encoder(batch_size).encode(sentences)
+        np.testing.assert_allclose(encoded, expected, rtol=1e-6)
+    np.testing.assert_allclose(fake_encoder(2).encode("a b"), expected_embedding(2), rtol=1e-6)
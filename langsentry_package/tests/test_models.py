@@ -0,0 +1,72 @@
+"""
+ModelRegistry: shared loads, idle release, and get() racing release_idle().
+
+    python -m pytest tests/test_models.py
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.models import ModelRegistry  # noqa: E402
+
+
+def counting_loader(loads):
+    def load():
+        loads.append(None)
+        return object()
+    return load
+
+
+def test_names_with_one_key_share_the_model():
+    registry = ModelRegistry()
+    loads = []
+    registry.register("a", ("gen", "gpt2"), counting_loader(loads))
+    registry.register("b", ("gen", "gpt2"), counting_loader(loads))
+    assert registry.get("a") is registry.get("b")
+    assert len(loads) == 1
+    assert sorted(registry.loaded()) == ["a", "b"]
+
+
+def test_release_idle_keeps_recently_used_models():
+    registry = ModelRegistry()
+    loads = []
+    registry.register("old", "old", counting_loader(loads))
+    registry.register("new", "new", counting_loader(loads))
+    registry.get("old")
+    time.sleep(0.05)
+    registry.get("new")
+    assert registry.release_idle(0.03) == ["old"]
+    assert registry.loaded() == ["new"]
+
+    # Released models are loaded again on the next use
+    registry.get("old")
+    assert len(loads) == 3 and registry.is_loaded("old")
+
+
+def test_get_racing_release_idle():
+    # Every timestamp belongs to a loaded model: get() never records a use of a model
+    # that release_idle() dropped in between
+    registry = ModelRegistry()
+    registry.register("model", "model", object)
+    stop = threading.Event()
+
+    def reap():
+        while not stop.is_set():
+            registry.release_idle(0)
+
+    # Switch threads as often as possible so the two interleave
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    reaper = threading.Thread(target=reap)
+    reaper.start()
+    try:
+        for _ in range(20000):
+            assert registry.get("model") is not None
+            with registry._key_locks["model"]:
+                assert set(registry._last_used) <= set(registry._models)
+    finally:
+        stop.set()
+        reaper.join()
+        sys.setswitchinterval(switch_interval)
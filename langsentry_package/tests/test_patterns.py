@@ -0,0 +1,110 @@
+"""
+Randomized test of PatternMatcher against one re.search / re.finditer per label, for
+the default and industry configs and for regexes with groups of their own, which the
+alternation has to map back to labels through match.lastindex.
+
+    python -m pytest tests/test_patterns.py
+"""
+import json
+import os
+import random
+import re
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry import patterns  # noqa: E402
+from langsentry.check_output import INDUSTRY_PROFILES, load_config  # noqa: E402
+from langsentry.patterns import PatternMatcher  # noqa: E402
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "config.json")
+
+# Regexes with inner, nested, optional and named groups, alternations inside and
+# around groups, leading flags, lookarounds and word boundaries
+GROUPED = [
+    r"(\d{3})-(\d{2})-(\d{4})",
+    r"((a)(b)?)",
+    r"(x)|(y)",
+    r"ab(c)?",
+    r"(?P<user>[a-z]+)@(?P<host>[a-z]+)\.com",
+    r"(?i)token(\d)",
+    r"(?:q(r)|s)+",
+    r"(?<=@)[a-z]+",
+    r"\bid(?=\d)",
+    r"(b)(?!a)",
+    r"[a-c]{2}",
+]
+# Backreferences make the matcher fall back to one search per label
+FALLBACK = [r"(\w)\1", r"(?P<d>\d)(?P=d)"]
+
+ALPHABET = list("abcxyqrs0123456789 -@.\n") + ["id", "TOKEN", "token", "@securebank.com", "securebank"]
+
+
+def config_patterns(tmp_path=None):
+    # The default config, one config file per industry and the repository's config.json
+    configs = [load_config()]
+    if tmp_path is not None:
+        for industry in INDUSTRY_PROFILES:
+            path = tmp_path / f"{industry}.json"
+            path.write_text(json.dumps(dict(load_config(), industry=industry)))
+            configs.append(load_config(str(path)))
+    if os.path.exists(CONFIG_PATH):
+        configs.append(load_config(CONFIG_PATH))
+    return [[(label, pattern["regex"]) for label, pattern in config["sensitive_patterns"].items()]
+            for config in configs]
+
+
+def expected_find(pairs, text, pos=0):
+    matches = sorted((match.start(), index, match.end())
+                     for index, (_, regex) in enumerate(pairs)
+                     for match in re.compile(regex).finditer(text, pos))
+    return [{"label": pairs[index][0], "span": (start, end), "text": text[start:end]}
+            for start, index, end in matches]
+
+
+def random_text(rng):
+    return "".join(rng.choice(ALPHABET) for _ in range(rng.randint(0, 60)))
+
+
+def check(pairs, text, pos):
+    matcher = PatternMatcher(pairs)
+    assert matcher.labels_in(text) == [label for label, regex in pairs if re.search(regex, text)], (pairs, text)
+    assert matcher.find(text, pos) == expected_find(pairs, text, pos), (pairs, text, pos)
+
+
+def test_config_patterns(tmp_path):
+    rng = random.Random(0)
+    for pairs in config_patterns(tmp_path):
+        for _ in range(300):
+            text = random_text(rng)
+            check(pairs, text, rng.randint(0, len(text)))
+
+
+def test_grouped_patterns():
+    rng = random.Random(1)
+    defaults = config_patterns()[0]
+    for _ in range(3000):
+        regexes = rng.sample(GROUPED, rng.randint(1, 5))
+        pairs = [(f"label{i}", regex) for i, regex in enumerate(regexes)]
+        if rng.random() < 0.3:
+            pairs += defaults
+        text = random_text(rng)
+        check(pairs, text, rng.choice([0, 0, rng.randint(0, len(text))]))
+
+
+def test_fallback_patterns():
+    rng = random.Random(2)
+    for _ in range(500):
+        pairs = [(f"label{i}", regex) for i, regex in enumerate(rng.sample(GROUPED + FALLBACK, 4))]
+        text = random_text(rng)
+        check(pairs, text, 0)
+
+
+def test_without_the_parser(monkeypatch):
+    # Without re._parser the gates are dropped, the results stay the same
+    monkeypatch.setattr(patterns, "sre_parse", None)
+    rng = random.Random(3)
+    for _ in range(500):
+        pairs = [(f"label{i}", regex) for i, regex in enumerate(rng.sample(GROUPED, 4))]
+        text = random_text(rng)
+        assert all(first is None for first in PatternMatcher(pairs).groups)
+        check(pairs, text, 0)
@@ -0,0 +1,119 @@
+"""
+PseudonymStore: tenants, TTL, the SQLite file and substring lookups, and the email
+pseudonyms of generate_fake_email_from_original built on them.
+
+    python -m pytest tests/test_pseudonyms.py
+"""
+import itertools
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.defenses import generate_fake_email_from_original  # noqa: E402
+from langsentry.pseudonyms import PseudonymStore  # noqa: E402
+
+
+def counter(prefix):
+    numbers = itertools.count()
+    return lambda: f"{prefix}{next(numbers)}"
+
+
+def test_tenants_are_separate():
+    store = PseudonymStore()
+    factory = counter("fake")
+    assert store.get_or_create("person", "alice", factory, tenant="a") == "fake0"
+    assert store.get_or_create("person", "alice", factory, tenant="b") == "fake1"
+    assert store.get_or_create("person", "alice", factory, tenant="a") == "fake0"
+    assert store.find("person", "alice", tenant="c") is None
+
+    store.clear(tenant="a")
+    assert store.get("person", "alice", tenant="a") is None
+    assert store.get("person", "alice", tenant="b") == "fake1"
+
+
+def test_ttl_expires_mappings():
+    store = PseudonymStore(ttl=0.05)
+    factory = counter("fake")
+    assert store.get_or_create("person", "alice", factory) == "fake0"
+    time.sleep(0.1)
+    assert store.get("person", "alice") is None
+    assert store.find("person", "alice") is None
+    assert store.get_or_create("person", "alice", factory) == "fake1"
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / "pseudonyms.db")
+    store = PseudonymStore(path=path)
+    store.get_or_create("person", "alice", lambda: ("Jane Roe", "jane_roe@gmail.com"), tenant="a")
+    store.put("org", "Acme", "Northwind Traders")
+    store.close()
+
+    reopened = PseudonymStore(path=path)
+    assert reopened.get("person", "alice", tenant="a") == ("Jane Roe", "jane_roe@gmail.com")
+    assert reopened.get("org", "Acme") == "Northwind Traders"
+    assert reopened.get("person", "alice", tenant="b") is None
+    assert reopened.find("person", "alice.smith", tenant="a") == ("alice", ("Jane Roe", "jane_roe@gmail.com"))
+    assert reopened.stats()["db_hits"] >= 2
+
+
+def test_sqlite_expired_rows_are_not_loaded(tmp_path):
+    path = str(tmp_path / "pseudonyms.db")
+    store = PseudonymStore(path=path, ttl=0.05)
+    store.get_or_create("person", "alice", lambda: "fake0")
+    time.sleep(0.1)
+    reopened = PseudonymStore(path=path, ttl=0.05)
+    assert reopened.get("person", "alice") is None
+    assert reopened.purge() == 1
+
+
+def test_sqlite_rows_are_capped(tmp_path):
+    store = PseudonymStore(maxsize=2, path=str(tmp_path / "pseudonyms.db"), max_rows=3)
+    factory = counter("fake")
+    for name in "abcdefg":
+        store.get_or_create("person", name, factory)
+    assert store.stats()["db_size"] == 3
+    assert store.get("person", "g") == "fake6"
+    assert store.get("person", "a") is None
+
+
+def test_find_substrings_oldest_first():
+    store = PseudonymStore()
+    store.put("person", "jsmith", "first")
+    store.put("person", "smith", "second")
+    assert store.find("person", "jsmith2") == ("jsmith", "first")
+    assert store.find("person", "smi") == ("jsmith", "first")
+    assert store.find("person", "mary") is None
+
+
+def test_find_skips_evicted():
+    store = PseudonymStore(maxsize=1)
+    store.put("person", "jsmith", "first")
+    store.put("person", "jsmith2", "second")  # evicts jsmith
+    assert store.find("person", "jsmith") == ("jsmith2", "second")
+
+
+def test_email_of_a_similar_local_part_reuses_the_person():
+    config = {"pseudonym_store": PseudonymStore(), "tenant": "clinic", "patient_mapping": {}}
+    first = generate_fake_email_from_original("jsmith@example.com", config)
+    assert generate_fake_email_from_original("jsmith@example.com", config) == first
+    assert generate_fake_email_from_original("jsmith2@other.org", config) == first
+
+    # Another tenant gets a person of its own
+    generate_fake_email_from_original("jsmith2@other.org", dict(config, tenant="other"))
+    assert config["pseudonym_store"].find("person", "jsmith", "other")[0] == "jsmith2"
+
+
+def test_patients_come_before_store():
+    config = {"pseudonym_store": PseudonymStore(),
+              "patient_mapping": {"jsmith": ("John Smith", "john.smith@example.com")}}
+    assert generate_fake_email_from_original("jsmith2@example.com", config) == "john.smith@example.com"
+
+
+def test_langsentry_store_stays_on_the_instance():
+    from langsentry.defenses import LangSentry
+
+    config = {"pseudonyms": {"maxsize": 10}}
+    first, second = LangSentry(None, config), LangSentry(None, config)
+    assert "pseudonym_store" not in config
+    assert first.config["pseudonym_store"] is not second.config["pseudonym_store"]
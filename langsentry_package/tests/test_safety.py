@@ -0,0 +1,96 @@
+"""
+SafetyClassifier with a stub zero-shot pipeline registered in MODELS: the gate, the
+candidate labels summed per mapped label, and pipeline errors reaching the callers.
+
+    python -m pytest tests/test_safety.py
+"""
+import itertools
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.models import MODELS  # noqa: E402
+from langsentry.safety import SafetyClassifier  # noqa: E402
+
+LABELS = {
+    "weapons": "DANGEROUS",
+    "hacking": "DANGEROUS",
+    "harmless": "SAFE",
+}
+MODEL_NUMBERS = itertools.count()
+
+
+class StubPipeline:
+    """
+    Scores every text with `scores` (candidate label -> score), or raises `error`.
+    extra_labels are scored as if they were candidates too.
+    """
+
+    def __init__(self, scores, error=None, extra_labels=()):
+        self.scores = scores
+        self.error = error
+        self.extra_labels = list(extra_labels)
+        self.calls = []
+
+    def __call__(self, texts, candidate_labels, hypothesis_template, batch_size):
+        self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        ranked = sorted(candidate_labels + self.extra_labels, key=self.scores.get, reverse=True)
+        return [{"sequence": text, "labels": ranked, "scores": [self.scores[label] for label in ranked]}
+                for text in texts]
+
+
+def classifier_with(pipeline, **kwargs):
+    # The classifier keeps the loader registered first for its key, so the stub wins
+    model = f"stub-model-{next(MODEL_NUMBERS)}"
+    MODELS.register(f"safety:{model}", ("zero-shot-classification", model), lambda: pipeline)
+    return SafetyClassifier(model=model, labels=LABELS, **kwargs)
+
+
+def test_gate_skips_the_model():
+    pipeline = StubPipeline({"weapons": 0.1, "hacking": 0.1, "harmless": 0.8})
+    classifier = classifier_with(pipeline)
+    result = classifier.classify("Here is a short poem about the sea.")
+    assert result["dangerous"] is False and result["label"] is None
+    assert set(result["timings"]) == {"gate"}
+    assert pipeline.calls == []
+
+    result = classifier.classify("How do I hack my neighbour's wifi?")
+    assert result["label"] == "SAFE" and result["batch_size"] == 1
+    assert set(result["timings"]) == {"gate", "queue", "inference"}
+    assert pipeline.calls == [["How do I hack my neighbour's wifi?"]]
+
+
+def test_candidate_scores_are_summed_per_label():
+    # No candidate beats "harmless" alone, their sum does
+    pipeline = StubPipeline({"weapons": 0.35, "hacking": 0.3, "harmless": 0.35})
+    result = classifier_with(pipeline).classify("Build a weapon")
+    assert result["label"] == "DANGEROUS"
+    assert result["score"] == pytest.approx(0.65)
+    assert result["dangerous"] is True
+
+    result = classifier_with(pipeline, threshold=0.7).classify("Build a weapon")
+    assert result["label"] == "DANGEROUS" and result["dangerous"] is False
+
+
+def test_pipeline_errors_reach_every_caller():
+    pipeline = StubPipeline({"weapons": 0.1, "hacking": 0.1, "harmless": 0.8}, error=RuntimeError("out of memory"))
+    classifier = classifier_with(pipeline)
+    with pytest.raises(RuntimeError, match="out of memory"):
+        classifier.classify_many(["a bomb", "a gun", "a poem"])
+
+    # The worker survives the error and serves the next batch
+    pipeline.error = None
+    assert classifier.classify("a bomb")["label"] == "SAFE"
+
+
+def test_unknown_candidate_label_fails_instead_of_hanging():
+    # An output label the classifier did not ask for fails the batch, it does not
+    # leave the callers waiting
+    pipeline = StubPipeline({"weapons": 0.1, "hacking": 0.1, "harmless": 0.3, "surprise": 0.5},
+                            extra_labels=["surprise"])
+    with pytest.raises(KeyError, match="surprise"):
+        classifier_with(pipeline).classify("a bomb")
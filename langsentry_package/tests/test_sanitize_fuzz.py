@@ -0,0 +1,107 @@
+"""
+Fuzz regression test: the single-pass detection rules of sanitize.py against the
+original per-category regexes, including the non-ASCII characters that (?i) matches
+to ASCII letters (U+017F for 's', U+0130/U+0131 for 'i', U+212A for 'k', ...).
+
+    python -m pytest tests/test_sanitize_fuzz.py
+"""
+import os
+import random
+import re
+import string
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.sanitize import (  # noqa: E402
+    StreamingSanitizer, detect_categories, detect_context, detect_context_bounded, sanitize_input,
+)
+
+RULES = [
+    ("html/javascript", r'(?i)<script|onerror=|<iframe|javascript:'),
+    ("sql", r"(?i)\b(SELECT|INSERT|DELETE|UPDATE|DROP|--|;|\bUNION\b|\bOR\b|\bAND\b)"),
+    ("shell", r'[\$`;&|><]'),
+    ("shell", r'(?i)\b(rm|chmod|chown|wget|curl|eval|exec|system)\b'),
+]
+INVISIBLE = "​‌‍﻿"
+
+# Every non-ASCII character that case-insensitively matches an ASCII letter
+CASE_FOLDS = [chr(code) for code in range(0x80, 0x10000)
+              if any(re.fullmatch(letter, chr(code), re.IGNORECASE) for letter in string.ascii_lowercase)]
+
+WORDS = ["select", "insert", "delete", "update", "drop", "union", "or", "and", "rm", "chmod",
+         "chown", "wget", "curl", "eval", "exec", "system", "<script", "onerror=", "<iframe",
+         "javascript:", "dolor", "order", "script"]
+
+
+def legacy_categories(text):
+    found = set()
+    if any(char in INVISIBLE or 0xE0000 <= ord(char) <= 0xE007F for char in text):
+        found.add("invisible_unicode")
+    for category, rule in RULES:
+        if re.search(rule, text):
+            found.add(category)
+    return found
+
+
+def legacy_detect_context(text):
+    found = legacy_categories(text)
+    for category in ("invisible_unicode", "html/javascript", "sql", "shell"):
+        if category in found:
+            return category
+    return "non-malicious"
+
+
+def mutate(word, rng):
+    # Swaps letters for their case-fold equivalents and random case
+    chars = []
+    for char in word:
+        folds = [fold for fold in CASE_FOLDS if re.fullmatch(char, fold, re.IGNORECASE)]
+        if folds and rng.random() < 0.5:
+            chars.append(rng.choice(folds))
+        else:
+            chars.append(char.upper() if rng.random() < 0.3 else char)
+    return "".join(chars)
+
+
+def make_input(rng):
+    pieces = list("ab x<>;-=:$\n") + [INVISIBLE[0], INVISIBLE[3], chr(0xE0041)]
+    text = []
+    for _ in range(rng.randint(0, 12)):
+        if rng.random() < 0.5:
+            text.append(mutate(rng.choice(WORDS), rng))
+        elif rng.random() < 0.3:
+            text.append(rng.choice(CASE_FOLDS))
+        else:
+            text.append(rng.choice(pieces))
+    return "".join(text)
+
+
+def test_case_folds_found():
+    assert {"ſ", "İ", "ı", "K"} <= set(CASE_FOLDS)
+    assert detect_context("ſelect * from users") == "sql"
+    assert detect_context("ſystem('x')") == "shell"
+
+
+def test_detection_matches_legacy_rules():
+    rng = random.Random(0)
+    for _ in range(20000):
+        text = make_input(rng)
+        expected = legacy_detect_context(text)
+        assert detect_context(text) == expected, text
+        assert detect_context_bounded(text) == expected, text
+        assert set(detect_categories(text)) == legacy_categories(text), text
+
+
+def test_streaming_matches_detect_categories():
+    rng = random.Random(1)
+    for _ in range(5000):
+        text = make_input(rng)
+        stream = StreamingSanitizer(max_length=rng.choice([5, 20, 256]))
+        pos = 0
+        while pos < len(text):
+            size = rng.randint(1, 8)
+            stream.feed(text[pos:pos + size])
+            pos += size
+        result = stream.close()
+        assert set(stream.categories) == legacy_categories(text), text
+        assert result == sanitize_input(text, stream.max_length), text
@@ -0,0 +1,77 @@
+"""
+The span rewriter of segregate_sensitive_info: overlap resolution, the one-pass
+rewrite, passwords searched between the kept spans, and no PII on stdout.
+
+    python -m pytest tests/test_segregate.py
+"""
+import logging
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry import defenses  # noqa: E402
+from langsentry.check_output import load_config  # noqa: E402
+from langsentry.defenses import rewrite_spans, segregate_sensitive_info, select_spans, spans_in_gaps  # noqa: E402
+from langsentry.pseudonyms import PseudonymStore  # noqa: E402
+
+
+def tag(name):
+    return lambda original: f"<{name}>"
+
+
+def test_lower_priority_number_wins_an_overlap():
+    # The later, longer span of priority 0 beats the earlier one of priority 1
+    kept = select_spans([(1, 0, 10, tag("b")), (0, 5, 20, tag("a"))])
+    assert [(start, end) for start, end, _ in kept] == [(5, 20)]
+
+
+def test_equal_priority_keeps_the_first_start():
+    kept = select_spans([(0, 5, 12, tag("b")), (0, 0, 8, tag("a"))])
+    assert [(start, end) for start, end, _ in kept] == [(0, 8)]
+
+
+def test_adjacent_spans_are_both_kept():
+    text = "aaaabbbbcccc"
+    kept = select_spans([(2, 8, 12, tag("c")), (0, 0, 4, tag("a")), (1, 4, 8, tag("b"))])
+    assert [(start, end) for start, end, _ in kept] == [(0, 4), (4, 8), (8, 12)]
+    assert rewrite_spans(text, kept) == "<a><b><c>"
+
+
+def test_rewrite_keeps_the_text_between_spans():
+    text = "Mail bob@example.com or call 555-123-4567 today."
+    spans = [(5, 20, tag("email")), (29, 41, tag("phone"))]
+    assert rewrite_spans(text, spans) == "Mail <email> or call <phone> today."
+    assert rewrite_spans(text, []) == text
+
+
+def test_passwords_only_in_gaps():
+    pattern = re.compile(r"(?=.*[A-Za-z])(?=.*\d)[A-Za-z\d]{12,}")
+    text = "key Secret123456789 mail Admin1234567890@example.com end"
+    email = text.index("Admin")
+    spans = [(email, email + len("Admin1234567890@example.com"), tag("email"))]
+    found = spans_in_gaps(pattern, text, spans, tag("password"))
+    assert [text[start:end] for start, end, _ in found] == ["Secret123456789"]
+
+
+@pytest.fixture
+def entity_nlp(monkeypatch):
+    spacy = pytest.importorskip("spacy")
+    nlp = spacy.blank("en")
+    nlp.add_pipe("entity_ruler").add_patterns([{"label": "PERSON", "pattern": "John Smith"},
+                                               {"label": "ORG", "pattern": "MediCare"}])
+    get = defenses.MODELS.get
+    monkeypatch.setattr(defenses.MODELS, "get", lambda name: nlp if name == "nlp" else get(name))
+    return nlp
+
+
+def test_segregate_logs_entities_instead_of_printing(entity_nlp, capsys, caplog):
+    config = dict(load_config(), patient_mapping={}, pseudonym_store=PseudonymStore())
+    text = "John Smith (jsmith@example.com) called on 555-123-4567."
+    with caplog.at_level(logging.DEBUG):
+        result = segregate_sensitive_info(text, config)
+    assert capsys.readouterr().out == ""
+    assert "John Smith" in caplog.text
+    assert "John Smith" not in result and "jsmith@example.com" not in result and "555-123-4567" not in result
@@ -0,0 +1,96 @@
+"""
+StreamingAnalyzer against analyze_response on the same text: same verdict, and nothing
+the full analysis blocks is flushed.
+
+    python -m pytest tests/test_streaming.py
+"""
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from langsentry.check_output import (  # noqa: E402
+    StreamingAnalyzer, analyze_response, detect_anomalies, find_sensitive_patterns, load_config,
+)
+
+spacy = pytest.importorskip("spacy")
+BLANK = spacy.blank("en")  # no entities, NER is not what is compared here
+
+WORDS = ["the", "account", "balance", "is", "fine", "today", "room", "4", "call", "me", "at",
+         "Administrators", "schedule", "clinic,", "ssn", "123-45-6789", "bob@securebank.com",
+         "abc1234567890", "hello", "world.", "\n", "\n"]
+
+
+def stream(text, config, chunk_sizes, canary_tokens=()):
+    analyzer = StreamingAnalyzer(config, canary_tokens=canary_tokens)
+    released = []
+    pos = 0
+    for size in chunk_sizes:
+        if pos >= len(text) or analyzer.blocked:
+            break
+        analyzer.feed(text[pos:pos + size])
+        released.append(analyzer.release())
+        pos += size
+    result = analyzer.close()
+    if not analyzer.blocked:
+        released.append(analyzer.release())
+    return analyzer, result, "".join(released)
+
+
+def check_against_full(text, config, chunk_sizes):
+    analyzer, result, released = stream(text, config, chunk_sizes)
+    expected = analyze_response(text, config, doc=BLANK(text))
+    assert released == text[:result["flushed"]]
+    if "Structured Data" in expected.get("reasons", {}):
+        # analyze_response says "flag" when anomalies come with it, streaming stops at once
+        assert result["verdict"] == "block", (text, result, expected)
+        first = min(match["span"][0] for match in find_sensitive_patterns(text, config))
+        assert result["flushed"] <= first, (text, result)
+    else:
+        assert result["verdict"] == expected["verdict"], (text, result, expected)
+        assert released == text
+        assert result.get("reasons", {}).get("Anomalies") == expected.get("reasons", {}).get("Anomalies")
+
+
+def test_lookahead_match_is_not_flushed():
+    config = load_config()
+    text = "Welcome back Administrators of the clinic, here is the schedule for room 4 today"
+    check_against_full(text, config, [5] * len(text))
+
+
+def test_matches_analyze_response():
+    config = load_config()
+    rng = random.Random(0)
+    for _ in range(2000):
+        text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 40)))
+        check_against_full(text, config, [rng.randint(1, 8) for _ in range(len(text))])
+
+
+def test_window_stays_bounded_without_whitespace():
+    config = load_config()
+    rng = random.Random(1)
+    # One 20k character word, with a digit but no run that the password regex matches
+    pieces = ["".join(rng.choice("abcdefXYZ") for _ in range(rng.randint(1, 8))) for _ in range(4000)]
+    pieces[2000] += "7"
+    text = "https://" + "/".join(pieces) + " done"
+    analyzer = StreamingAnalyzer(config)
+    longest = 0
+    for pos in range(0, len(text), 20):
+        analyzer.feed(text[pos:pos + 20])
+        longest = max(longest, len(analyzer._buffer))
+    result = analyzer.close()
+    assert longest <= analyzer.max_holdback + analyzer.holdback + analyzer.CONTEXT + 20
+    assert result["verdict"] == "flag"
+    assert result["reasons"]["Anomalies"] == detect_anomalies(text)
+    assert result["flushed"] == len(text)
+
+
+def test_canary_split_across_chunks():
+    config = load_config()
+    text = "x" * 500 + "\nthe secret is c0ffee42 and more"
+    analyzer, result, released = stream(text, config, [7] * len(text), canary_tokens=["c0ffee42"])
+    assert result["verdict"] == "block"
+    assert result["reasons"]["Canary Tokens"] == ["c0ffee42"]
+    assert "c0ffee42" not in released